@@ -46,22 +46,22 @@ If you do not have errors in the flux:
 
 :param dist: distance in Mpc
     """
-    import uncertainties.unumpy as unumpy
+    from . import lsd
 
     c=29979245800.	# speed of light in CGS
     dist=dist*3.085677581e24	# Mpc -> cm
 
     nu=10**lognu
     lamb=c/nu*1e4 # cm -> micron
-    if llerr!=None:
-    	lllerr=unumpy.uarray(ll,llerr)
+    if llerr is not None:
+    	lllerr=lsd.UArray(ll,llerr)
     else:
     	lllerr=ll
     lnuerr=10**lllerr/nu  
     fluxerr=lnuerr/(1e-26*4.*numpy.pi*dist**2) # Lnu (erg/s/Hz) -> Fnu (mJy)
-    if llerr!=None:
-    	fluxerr=unumpy.log10(fluxerr)
-    	return numpy.log10(lamb),unumpy.nominal_values(fluxerr),unumpy.std_devs(fluxerr)
+    if llerr is not None:
+    	fluxerr=fluxerr.log10()
+    	return numpy.log10(lamb),fluxerr.val,fluxerr.err
     else:
     	return numpy.log10(lamb),numpy.log10(fluxerr)
 
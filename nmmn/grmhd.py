@@ -227,15 +227,9 @@ Saves data as an ASCII file with columns corresponding to variables:
 		self.xc,self.yc=numpy.meshgrid(xnew,ynew) # 2D
 		self.xc1d,self.yc1d,self.zc1d=xnew,ynew,znew # 1D
 
-		# bottleneck,
-		self.rhoc=lsd.regrid(self.x,self.y,self.rho,xnew,ynew)
-		self.pc=lsd.regrid(self.x,self.y,self.p,xnew,ynew)
-		self.vxc=lsd.regrid(self.x,self.y,self.vx,xnew,ynew)
-		self.vyc=lsd.regrid(self.x,self.y,self.vy,xnew,ynew)
-		self.vzc=lsd.regrid(self.x,self.y,self.vz,xnew,ynew)
-		self.bxc=lsd.regrid(self.x,self.y,self.bx,xnew,ynew)
-		self.byc=lsd.regrid(self.x,self.y,self.by,xnew,ynew)
-		self.bzc=lsd.regrid(self.x,self.y,self.bz,xnew,ynew)
+		# bottleneck, the triangulation is computed only once for all arrays
+		r=lsd.Regridder(self.x,self.y,xnew,ynew)
+		self.rhoc,self.pc,self.vxc,self.vyc,self.vzc,self.bxc,self.byc,self.bzc=r(self.rho,self.p,self.vx,self.vy,self.vz,self.bx,self.by,self.bz)
 
 		self.bc=numpy.sqrt(self.bxc**2+self.byc**2)
 		self.vc=numpy.sqrt(self.vxc**2+self.vyc**2)
@@ -314,20 +308,17 @@ Saves data as an ASCII file with columns corresponding to variables:
 		self.xc,self.yc=numpy.meshgrid(xnew,ynew) # 2D
 		self.xc1d,self.yc1d=xnew,ynew # 1D
 
-		# bottleneck
+		# bottleneck, the triangulation is computed only once for all arrays
+		r=lsd.Regridder(self.x,self.y,xnew,ynew)
 		if 'rho' in listarr:
-			self.rhoc=lsd.regrid(self.x,self.y,self.rho,xnew,ynew)
+			self.rhoc=r(self.rho)
 		if 'p' in listarr: 
-			self.pc=lsd.regrid(self.x,self.y,self.p,xnew,ynew)
+			self.pc=r(self.p)
 		if 'v' in listarr:
-			self.vxc=lsd.regrid(self.x,self.y,self.vx,xnew,ynew)
-			self.vyc=lsd.regrid(self.x,self.y,self.vy,xnew,ynew)
-			self.vzc=lsd.regrid(self.x,self.y,self.vz,xnew,ynew)
+			self.vxc,self.vyc,self.vzc=r(self.vx,self.vy,self.vz)
 			self.vc=numpy.sqrt(self.vxc**2+self.vyc**2)
 		if 'b' in listarr:
-			self.bxc=lsd.regrid(self.x,self.y,self.bx,xnew,ynew)
-			self.byc=lsd.regrid(self.x,self.y,self.by,xnew,ynew)
-			self.bzc=lsd.regrid(self.x,self.y,self.bz,xnew,ynew)
+			self.bxc,self.byc,self.bzc=r(self.bx,self.by,self.bz)
 			self.bc=numpy.sqrt(self.bxc**2+self.byc**2)
 
 
@@ -169,29 +169,83 @@ Piece of code based on http://stackoverflow.com/questions/2566412/find-nearest-v
 	
 
 
-def sortindex(x,**kwargs):
+def sortindex(x,reverse=False,k=None,order=None):
 	"""
-Returns the list of indexes, ordered according to the numerical value of each 
-element of x.
+Returns the array of indexes, ordered according to the numerical value of each 
+element of x. Uses ``numpy.argsort`` (or ``numpy.lexsort`` for multiple keys)
+with a stable algorithm, i.e. equal elements keep their original order.
 
-:param x: input array or list.
-:returns: list of element indexes.
+>>> i=sortindex(x)
+
+Descending order:
+
+>>> i=sortindex(x,reverse=True)
+
+Sort by multiple keys, e.g. by mass and then by distance for objects with 
+the same mass (the first key is the primary one):
+
+>>> i=sortindex([mass,dist])
+
+Indexes of the 10 largest elements, in descending order, using a partial sort 
+(``numpy.argpartition``) which is much faster than sorting the whole array:
+
+>>> i=sortindex(x,reverse=True,k=10)
+
+:param x: input array or list. If a list of arrays or a 2D array is given, each row is interpreted as a sorting key, the first one being the primary key. Structured arrays are also accepted (see order)
+:param reverse: if True, sorts in descending order
+:param k: if given, returns only the indexes of the k first elements in the sorted order
+:param order: for structured arrays, field name or list of field names to sort by, as in ``numpy.argsort``
+:returns: array of element indexes.
 	"""
-	f=lambda i: x[i]
+	x=numpy.asarray(x)
+	n=x.shape[-1] if x.ndim>0 else 1
+	if k is None or k>n: k=n
+	partial= x.ndim==1 and order is None and k<n
+
+	# Descending stable sort: sorts the reversed array in ascending order and
+	# takes the result backwards, which keeps ties in their original order
+	if reverse: x=x[...,::-1]
+
+	if partial:
+		# partial sort: finds the k-th smallest (largest) value, then sorts 
+		# only the elements up to (from) it, keeping all ties for stability
+		if k==0: return numpy.arange(0)
+		if reverse:
+			xk=x[numpy.argpartition(x,n-k)[n-k]]
+			i=numpy.flatnonzero(x>=xk)
+		else:
+			xk=x[numpy.argpartition(x,k-1)[k-1]]
+			i=numpy.flatnonzero(x<=xk)
+		i=i[numpy.argsort(x[i],kind='stable')]
+	elif x.ndim>1:	# multiple keys, lexsort uses the last key as the primary one
+		i=numpy.lexsort(x[::-1])
+	else:
+		i=numpy.argsort(x,kind='stable',order=order)
+
+	if reverse: 
+		i=n-1-i[::-1]
 
-	return sorted( range(numpy.size(x)) , key=f,**kwargs)
+	return i[:k]
 	
 
 
 
-def norm(x1,x2=None):
+def norm(x1,x2=None,out=None):
 	"""
 Normalizes x1. If also given as input x2, then normalizes x1 to x2.
 
+If x1 or x2 are memory-mapped arrays (``numpy.memmap``), the computation is
+done in chunks with bounded memory with :func:`chunknorm`. In this case,
+it is a good idea to provide an output memmap with the out argument.
+
 :param x1: input array
 :param x2: optional
+:param out: optional output array, only used for memmap inputs
 :returns: normalized x1
 	"""
+	if isinstance(x1,numpy.memmap) or isinstance(x2,numpy.memmap):
+		return chunknorm(x1,x2,out=out)
+
 	if x2 is None:
 		return x1/x1.max()
 	else:
@@ -200,6 +254,223 @@ Normalizes x1. If also given as input x2, then normalizes x1 to x2.
 
 
 
+# Chunked operations
+# ====================
+# Reductions and elementwise operations over arrays that do not fit in
+# memory (e.g. numpy.memmap or numpy.load(..., mmap_mode='r')), carried
+# out in blocks along the first axis so that only chunksize elements are
+# in memory at any time.
+
+def chunkslices(x,chunksize=2**22):
+	"""
+Generator of slices along the first axis of x, each one selecting about
+chunksize elements (at least one row).
+
+>>> for i in chunkslices(x): y[i]=2*x[i]
+	"""
+	n=len(x)
+	rowsize=max(1, numpy.size(x)//max(n,1))
+	step=max(1, chunksize//rowsize)
+
+	for i in range(0,n,step):
+		yield slice(i,min(i+step,n))
+
+
+
+
+def chunkmax(x,chunksize=2**22):
+	"""
+Maximum of the array x, computed in chunks.
+	"""
+	return max(x[i].max() for i in chunkslices(x,chunksize))
+
+
+
+
+def chunkmin(x,chunksize=2**22):
+	"""
+Minimum of the array x, computed in chunks.
+	"""
+	return min(x[i].min() for i in chunkslices(x,chunksize))
+
+
+
+
+def chunkmean(x,chunksize=2**22,std=False):
+	"""
+Mean of the array x, computed in chunks. Optionally also returns the 
+standard deviation, computed by combining the chunk statistics with the
+parallel algorithm of Chan et al. (a generalization of Welford's method
+which is numerically stable).
+
+>>> m=chunkmean(x)
+>>> m,sd=chunkmean(x,std=True)
+	"""
+	n,mean,m2=0,0.,0.
+
+	for i in chunkslices(x,chunksize):
+		c=numpy.asarray(x[i],dtype=float)
+		nc=c.size
+		if nc==0: continue
+		meanc=c.mean()
+		m2c=((c-meanc)**2).sum()
+
+		# merges the chunk with the running statistics
+		delta=meanc-mean
+		ntot=n+nc
+		mean=mean+delta*nc/ntot
+		m2=m2+m2c+delta**2*n*nc/ntot
+		n=ntot
+
+	if std:
+		return mean, numpy.sqrt(m2/n)
+	else:
+		return mean
+
+
+
+
+def chunkpercentile(x,q,chunksize=2**22,bins=4096,maxbuffer=2**20):
+	"""
+Percentile(s) of the array x, computed in chunks with bounded memory. The
+order statistics are found exactly, hence the result is the same as 
+``numpy.percentile`` (linear interpolation) up to rounding.
+
+The order statistics needed are located by successive histogram 
+refinements: each pass over the data histograms the elements in the bin 
+that contains the desired rank, until that bin has at most maxbuffer 
+elements, which are then gathered and sorted. Usually two or three passes
+(beyond the one for the min/max) are needed.
+
+>>> p16,p50,p84=chunkpercentile(x,[16,50,84])
+
+:param x: input array (e.g. memmap), must not contain NaNs
+:param q: percentile or sequence of percentiles, between 0 and 100
+:param bins: number of histogram bins in each refinement
+:param maxbuffer: maximum number of elements that are gathered in memory
+:returns: percentile(s)
+	"""
+	q=numpy.asarray(q,dtype=float)
+	n=numpy.size(x)
+
+	# position of each percentile in the sorted array
+	pos=(n-1)*q.ravel()/100.
+	k0=numpy.floor(pos).astype(int)
+	k1=numpy.minimum(k0+1,n-1)
+	ks=numpy.unique(numpy.concatenate((k0,k1)))
+
+	xmin,xmax=chunkmin(x,chunksize),chunkmax(x,chunksize)
+
+	# for each rank: list of refinement levels (lo,hi,bin), number of 
+	# elements below the current selection and the resulting value
+	levels=dict((k,[]) for k in ks)
+	below=dict((k,0) for k in ks)
+	value={}
+	lohi=dict((k,(xmin,xmax)) for k in ks)
+
+	def select(c,k):
+		# elements of the chunk c in the current selection for rank k
+		for lo,hi,j in levels[k]:
+			c=c[_binindex(c,lo,hi,bins)==j]
+		return c
+
+	while len(value)<len(ks):
+		todo=[k for k in ks if k not in value]
+
+		# histograms of the current selection for each rank
+		counts=dict((k,numpy.zeros(bins,dtype=numpy.int64)) for k in todo)
+		cmin=dict((k,numpy.inf) for k in todo)
+		cmax=dict((k,-numpy.inf) for k in todo)
+		for i in chunkslices(x,chunksize):
+			c=numpy.ravel(x[i])
+			for k in todo:
+				v=select(c,k)
+				if v.size==0: continue
+				lo,hi=lohi[k]
+				counts[k]+=numpy.bincount(_binindex(v,lo,hi,bins),minlength=bins)
+				cmin[k],cmax[k]=min(cmin[k],v.min()),max(cmax[k],v.max())
+
+		gather=[]
+		for k in todo:
+			if cmin[k]==cmax[k]:	# all elements in the selection are equal
+				value[k]=cmin[k]
+				continue
+
+			lo,hi=lohi[k]
+			cum=numpy.cumsum(counts[k])
+			j=numpy.searchsorted(cum,k-below[k],side='right')
+			if j>0: below[k]+=cum[j-1]
+			levels[k].append((lo,hi,j))
+			w=(hi-lo)/bins
+			lohi[k]=(lo+j*w,lo+(j+1)*w)
+
+			if counts[k][j]<=maxbuffer: gather.append(k)
+
+		# final pass: gathers the selected elements and sorts them
+		if len(gather)>0:
+			buf=dict((k,[]) for k in gather)
+			for i in chunkslices(x,chunksize):
+				c=numpy.ravel(x[i])
+				for k in gather:
+					buf[k].append(select(c,k))
+			for k in gather:
+				v=numpy.sort(numpy.concatenate(buf[k]))
+				value[k]=v[k-below[k]]
+
+	v0=numpy.array([value[k] for k in k0])
+	v1=numpy.array([value[k] for k in k1])
+	p=v0+(pos-k0)*(v1-v0)
+
+	if q.ndim==0:
+		return p[0]
+	else:
+		return p.reshape(q.shape)
+
+
+
+
+def _binindex(x,lo,hi,bins):
+	"""
+Index of the histogram bin of each element of x, for bins equally spaced
+in [lo,hi]. Elements outside the range go to the first or last bins.
+	"""
+	if hi==lo: 
+		return numpy.zeros(x.shape,dtype=int)
+	i=numpy.floor((x-lo)/(hi-lo)*bins).astype(int)
+
+	return numpy.clip(i,0,bins-1)
+
+
+
+
+def chunknorm(x1,x2=None,out=None,chunksize=2**22):
+	"""
+Same as :func:`norm`, but the maxima and the normalization are computed
+in chunks, with bounded memory. Use this for memory-mapped arrays.
+
+>>> y=numpy.lib.format.open_memmap('ynorm.npy',mode='w+',dtype=float,shape=x.shape)
+>>> chunknorm(x,out=y)
+
+:param x1: input array
+:param x2: optional
+:param out: output array (e.g. memmap). If not given, the result is created in memory
+:returns: normalized x1
+	"""
+	if x2 is None:
+		factor=1./chunkmax(x1,chunksize)
+	else:
+		factor=chunkmax(x2,chunksize)/chunkmax(x1,chunksize)
+
+	if out is None:
+		out=numpy.empty(numpy.shape(x1),dtype=numpy.result_type(x1,factor))
+
+	for i in chunkslices(x1,chunksize):
+		out[i]=x1[i]*factor
+
+	return out
+
+
+
 
 def uarray(x,errx):
 	"""
@@ -225,6 +496,10 @@ the tables created with astropy.io.ascii.
 
 Usage is the same as uncertainties.unumpy.uarray.
 
+For large arrays, consider using :class:`UArray` instead, which stores 
+the values and errors as two plain arrays rather than one Python object 
+per element.
+
 :type x,errx: arrays created with astropy.io.ascii.
 :returns: uncertainties array.
 	"""
@@ -241,6 +516,161 @@ Usage is the same as uncertainties.unumpy.uarray.
 
 
 	
+
+
+
+
+class UArray:
+	"""
+Lightweight array of values with uncertainties (1-sigma errors), stored
+as two numpy arrays instead of one Python object per element like 
+``uncertainties.unumpy``. Arithmetic (+, -, *, /, \*\*) and the 
+:meth:`log10`, :meth:`log`, :meth:`exp` methods propagate the errors to 
+first order with vectorized numpy expressions.
+
+NOTE: the errors are assumed to be independent, i.e. correlations are not 
+tracked as in ``uncertainties`` (for instance, x-x has a nonzero error).
+For the common case of operations involving a single uncertain quantity
+the results are identical.
+
+>>> m=nmmn.lsd.UArray(mass,errmass)
+>>> x=0.2*m
+>>> logx=x.log10()
+>>> y=10**logx
+>>> y.val, y.err
+
+Conversion from/to ``uncertainties.unumpy`` arrays:
+
+>>> m=nmmn.lsd.UArray(unumpyarr)
+>>> unumpyarr=m.tounumpy()
+
+Attributes:
+
+- val: nominal values
+- err: standard deviations
+	"""
+
+	# makes numpy defer to the methods below in operations like array*UArray
+	__array_ufunc__=None
+
+	def __init__(self, x, errx=None):
+		"""
+	:param x: array of nominal values, or unumpy array (or UArray) if errx is not given
+	:param errx: array of 1-sigma uncertainties
+		"""
+		if errx is None:
+			if isinstance(x,UArray):
+				x,errx=x.val,x.err
+			else:	# unumpy array
+				import uncertainties.unumpy as unumpy
+
+				x,errx=unumpy.nominal_values(x),unumpy.std_devs(x)
+
+		# numpy.array also handles astropy.io.ascii columns (cf. uarray)
+		self.val=numpy.array(x,dtype=float)
+		self.err=numpy.abs(numpy.array(errx,dtype=float))*numpy.ones_like(self.val)
+
+	def tounumpy(self):
+		"""
+	Converts to an ``uncertainties.unumpy`` array.
+		"""
+		import uncertainties.unumpy as unumpy
+
+		return unumpy.uarray(self.val,self.err)
+
+	def __repr__(self):
+		return 'UArray(%s, %s)' % (repr(self.val), repr(self.err))
+
+	def __len__(self):
+		return len(self.val)
+
+	def __getitem__(self, i):
+		return UArray(self.val[i],self.err[i])
+
+	@property
+	def shape(self):
+		return self.val.shape
+
+	@property
+	def size(self):
+		return self.val.size
+
+	# Error propagation
+	def __neg__(self):
+		return UArray(-self.val,self.err)
+
+	def __add__(self, y):
+		a,sa=self.val,self.err
+		b,sb=_uparts(y)
+		return UArray(a+b, numpy.hypot(sa,sb))
+
+	__radd__=__add__
+
+	def __sub__(self, y):
+		a,sa=self.val,self.err
+		b,sb=_uparts(y)
+		return UArray(a-b, numpy.hypot(sa,sb))
+
+	def __rsub__(self, y):
+		return -self+y
+
+	def __mul__(self, y):
+		a,sa=self.val,self.err
+		b,sb=_uparts(y)
+		return UArray(a*b, numpy.hypot(b*sa,a*sb))
+
+	__rmul__=__mul__
+
+	def __truediv__(self, y):
+		a,sa=self.val,self.err
+		b,sb=_uparts(y)
+		return UArray(a/b, numpy.hypot(sa/b,a*sb/b**2))
+
+	def __rtruediv__(self, y):
+		return UArray(y,0.)/self
+
+	def __pow__(self, y):
+		a,sa=self.val,self.err
+		b,sb=_uparts(y)
+		f=a**b
+		# d(a^b) = b a^(b-1) da + a^b ln(a) db, the second term only if b is uncertain
+		err=b*a**(b-1.)*sa
+		if numpy.any(sb!=0):
+			err=numpy.hypot(err, f*numpy.log(a)*sb)
+		return UArray(f, err)
+
+	def __rpow__(self, y):
+		return UArray(y,0.)**self
+
+	def log10(self):
+		return UArray(numpy.log10(self.val), self.err/(numpy.abs(self.val)*numpy.log(10.)))
+
+	def log(self):
+		return UArray(numpy.log(self.val), self.err/numpy.abs(self.val))
+
+	def exp(self):
+		f=numpy.exp(self.val)
+		return UArray(f, f*self.err)
+
+
+
+
+def _uparts(y):
+	"""
+Returns the nominal values and errors of y, which can be a UArray or a
+number/array without uncertainties.
+	"""
+	if isinstance(y,UArray):
+		return y.val,y.err
+	else:
+		return numpy.asarray(y,dtype=float),0.
+
+
+
+
+
+
+	
 def bootstrap(v):
 	"""
 Constructs Monte Carlo simulated data set using the
@@ -282,15 +712,113 @@ For the interpolation method, choose nearest, linear or cubic.
 
 >>> rho=regrid(d.x,d.y,d.rho,xnew,ynew)
 
+If you need to regrid several fields defined on the same points (or the 
+same field at many snapshots), use a :class:`Regridder` object instead: 
+the geometry is then computed only once.
+
 .. todo:: need to create a 3d version of this method, paving the road for the 3d simulations.
 	"""
-	import scipy.interpolate
+	return Regridder(x,y,xnew,ynew,method=method)(z)
+
+
+
+
+class Regridder:
+	"""
+Reusable interpolator that maps scalar fields defined at scattered 
+positions (x,y) onto the cartesian grid defined by the 1D arrays 
+xnew,ynew. Gives the same results as :func:`regrid` (i.e. 
+``scipy.interpolate.griddata`` with NaNs set to zero), but all the 
+geometry is computed once when the object is created:
+
+- nearest: index of the nearest source point for each grid point (k-d tree)
+- linear: Delaunay triangulation and barycentric weights
+- cubic: Delaunay triangulation for the Clough-Tocher interpolant
+
+For the nearest and linear methods the interpolation is stored as a 
+sparse matrix, such that regridding any number of fields is a single 
+sparse matrix product. The cubic interpolant depends nonlinearly on the 
+estimated gradients, so in that case the triangulation is reused and all 
+fields are interpolated in one Clough-Tocher call.
+
+Creates the regridder and regrids density and pressure:
+
+>>> r=nmmn.lsd.Regridder(d.x,d.y,xnew,ynew,method='linear')
+>>> rhoc=r(d.rho)
+>>> rhoc,pc=r(d.rho,d.p)
+
+The object is picklable, so it can be cached to disk and reused in 
+later sessions or sent to worker processes:
+
+>>> pickle.dump(r,open('regridder.pkl','wb'))
+	"""
+
+	def __init__(self,x,y,xnew,ynew,method='cubic'):
+		"""
+	:param x,y: 1D arrays with the positions of the source points
+	:param xnew,ynew: 1D arrays defining the new cartesian grid
+	:param method: nearest, linear or cubic
+		"""
+		import scipy.spatial, scipy.sparse
+
+		points=numpy.column_stack((numpy.ravel(x),numpy.ravel(y)))
+		self.method=method
+		self.npoints=points.shape[0]
+		self.shape=(numpy.size(ynew),numpy.size(xnew))	# output is Z[y,x]
+
+		# target points, in the same order as the flattened Z[y,x]
+		xg,yg=numpy.meshgrid(xnew,ynew)
+		xi=numpy.column_stack((xg.ravel(),yg.ravel()))
+		nnew=xi.shape[0]
+
+		if method=='nearest':
+			tree=scipy.spatial.cKDTree(points)
+			d,j=tree.query(xi)
+			self.matrix=scipy.sparse.csr_matrix((numpy.ones(nnew),(numpy.arange(nnew),j)), shape=(nnew,self.npoints))
+		elif method=='linear':
+			tri=scipy.spatial.Delaunay(points)
+			isim=tri.find_simplex(xi)
+			ok=numpy.flatnonzero(isim>=0)	# grid points inside the convex hull
+			isim=isim[ok]
+
+			# barycentric coordinates of each grid point inside its triangle
+			t=tri.transform[isim]
+			b=numpy.einsum('ijk,ik->ij', t[:,:2,:], xi[ok]-t[:,2,:])
+			w=numpy.column_stack((b, 1.-b.sum(axis=1)))
+
+			rows=numpy.repeat(ok,3)
+			cols=tri.simplices[isim].ravel()
+			self.matrix=scipy.sparse.csr_matrix((w.ravel(),(rows,cols)), shape=(nnew,self.npoints))
+		elif method=='cubic':
+			self.tri=scipy.spatial.Delaunay(points)
+			self.xi=xi
+		else:
+			raise ValueError('Unknown interpolation method: %s' % method)
+
 
-	# regrid the data to a nice cartesian grid
-	Z = scipy.interpolate.griddata((x, y), z, (xnew[None,:], ynew[:,None]), method=method)
 
-	# get rid of NaNs
-	return nanzero(Z)
+	def __call__(self,*fields):
+		"""
+	Regrids one or more fields defined at the source points.
+
+	:param fields: 1D arrays with the values at the source points
+	:returns: 2D array Z[y,x] or list of arrays if more than one field was given
+		"""
+		import scipy.interpolate
+
+		z=numpy.column_stack([numpy.ravel(f) for f in fields])
+
+		if self.method=='cubic':
+			zi=scipy.interpolate.CloughTocher2DInterpolator(self.tri,z)(self.xi)
+		else:
+			zi=self.matrix.dot(z)
+
+		zi=[nanzero(zi[:,k].reshape(self.shape)) for k in range(z.shape[1])]
+
+		if len(fields)==1:
+			return zi[0]
+		else:
+			return zi
 
 
 
@@ -302,23 +830,98 @@ you define.
 
 >>> Znew,Xnew,Ynew = crop(Z, X, Y, 0,10,-20,20)
 
-where X,Y,Z are 2D arrays.
+where Z is a 2D array indexed as Z[y,x] and X,Y are the 1D (monotonic) 
+coordinate arrays. The region is inclusive of the boundaries. The 
+returned arrays are views of the input arrays, not copies (cf. 
+:func:`cropnd`).
 	"""
-	# Index tuples with elements that will be selected along each dimension
-	i=numpy.where((x>=xmin) & (x<=xmax))	# x
-	j=numpy.where((y>=ymin) & (y<=ymax))	# y
-	
-	# Defines new x and y arrays
-	xnew,ynew=x[i],y[j]
+	j,i=cropslices([y,x], [[ymin,ymax],[xmin,xmax]])	# CAREFUL with the ordering of the indexes!
 	
-	i,j=i[0],j[0]	# tuples -> arrays (for matrix slicing below)
-	znew=cube[j[0]:j[-1],i[0]:i[-1]]	# CAREFUL with the ordering of the indexes!
-	
-	return znew,xnew,ynew	
+	return cube[j,i],x[i],y[j]
+
 
 
 
+def _axisslice(x, xmin=None, xmax=None):
+	"""
+Returns the slice selecting the elements of the monotonic (ascending or
+descending) 1D array x with values inside [xmin,xmax]. Uses binary search.
+	"""
+	x=numpy.asarray(x)
+	if xmin is None: xmin=-numpy.inf
+	if xmax is None: xmax=numpy.inf
+
+	if x.size<2 or x[0]<=x[-1]:	# ascending
+		i0=numpy.searchsorted(x,xmin,side='left')
+		i1=numpy.searchsorted(x,xmax,side='right')
+	else:	# descending: search the reversed view
+		n=x.size
+		i0=n-numpy.searchsorted(x[::-1],xmax,side='right')
+		i1=n-numpy.searchsorted(x[::-1],xmin,side='left')
+		
+	return slice(int(i0),int(max(i0,i1)))
 
 
 
 
+def cropslices(axes, limits):
+	"""
+Computes the slices that select, along each monotonic coordinate axis,
+the elements inside the given limits. The search is done with 
+``numpy.searchsorted``, i.e. O(log n) per axis instead of scanning the
+whole array.
+
+>>> s=cropslices([z,y,x], [[zmin,zmax],[ymin,ymax],[xmin,xmax]])
+>>> rhonew=rho[s]
+
+:param axes: list of 1D monotonic coordinate arrays, one per array dimension, in the same order as the array indexes
+:param limits: list of [min,max] pairs, one per axis. Use None (either for the pair or for one of its values) to leave that side uncropped
+:returns: tuple of slice objects
+	"""
+	s=[]
+	for x,lim in zip(axes,limits):
+		if lim is None: lim=[None,None]
+		s.append( _axisslice(x,lim[0],lim[1]) )
+
+	return tuple(s)
+
+
+
+
+def cropnd(fields, axes, limits):
+	"""
+Crops N-dimensional arrays (e.g. 3D data cubes from GRMHD simulations),
+leaving only the elements inside the region you define. 
+
+Since the coordinate arrays are assumed to be monotonic, the cropping
+region is found with a binary search and the arrays are cropped with 
+basic slicing. Hence the returned arrays are *views* of the input arrays
+(no data is copied) and this works just as well for memory-mapped arrays
+(``numpy.memmap`` or ``numpy.load(..., mmap_mode='r')``), in which case 
+nothing is read from disk until the data is actually used.
+
+Crop a 3D cube indexed as rho[z,y,x]:
+
+>>> rhonew,(znew,ynew,xnew) = cropnd(rho, [z,y,x], [[-10,10],[0,20],[0,20]])
+
+Crop several fields sharing the same axes in one call:
+
+>>> (rhonew,pnew),(ynew,xnew) = cropnd([rho,p], [y,x], [[-20,20],None])
+
+:param fields: array or list of arrays to be cropped
+:param axes: list of 1D monotonic coordinate arrays, one per array dimension, in the same order as the array indexes
+:param limits: list of [min,max] pairs, one per axis. Use None to leave an axis (or one side of it) uncropped
+:returns: cropped field (or list of fields if a list was given) and list of cropped axes
+	"""
+	s=cropslices(axes, limits)
+	
+	# cropped coordinate arrays
+	axesnew=[x[i] for x,i in zip(axes,s)]
+
+	if type(fields)==list or type(fields)==tuple:
+		fieldsnew=[f[s] for f in fields]
+	else:	# a single array
+		fieldsnew=fields[s]
+	
+	return fieldsnew, axesnew
+
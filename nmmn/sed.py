@@ -8,6 +8,16 @@ Methods and classes for dealing with spectral energy distributions (SEDs).
 import numpy
 from . import lsd # intrapackage reference
 
+
+# Frequency bands in log10(nu/Hz) used for the band luminosities 
+# (see SEDStack.lum)
+bands={
+	'radio': [8., 11.477],	# 100 MHz - 300 GHz
+	'optical': [14.632, 14.875],	# 7000-4000 AA
+	'x': [17.684, 18.384],	# 2-10 keV
+	'ion': [15.52, 22.],	# 13.6 eV - "infty"
+}
+
 class SED:
 	"""
 	Class that defines objects storing Spectral energy distributions (SEDs). 
@@ -47,7 +57,106 @@ class SED:
 	>>> s.bol()
 	
 	after which the value will be stored in s.lumbol	
+
+	Only one of the linear and log versions of each array (e.g. nu and
+	lognu) needs to be stored, the other one is computed when first 
+	accessed. Likewise, the interpolated arrays (lognui, lli, nui, nlnui, 
+	see interp) and the derived quantities lumbol, lumx, gammax, eddratio
+	and qion are computed on demand and cached. Whenever the arrays 
+	change (e.g. s.ll=... or s.sort()), the cached quantities that depend 
+	on them are discarded, so they are never stale.
 	"""
+
+	# Pairs of attributes holding the same data in linear and log scale. 
+	# Only one of each pair needs to be stored.
+	_pairs={'nu':'lognu', 'lognu':'nu', 'nlnu':'ll', 'll':'nlnu', 
+		'nui':'lognui', 'lognui':'nui', 'nlnui':'lli', 'lli':'nlnui'}
+	_logs=('lognu','ll','lognui','lli')
+	# observed and interpolated arrays
+	_data=('nu','lognu','nlnu','ll')
+	_interpolated=('nui','lognui','nlnui','lli')
+	# other arrays with one value per data point (reordered by sort)
+	_pointarrays=('lnu','nlnuex','llex','ul','lognuerr','llerr')
+	# derived quantities and the methods that compute them
+	_derived={'lumbol':'bol', 'lumx':'xrays', 'gammax':'xrays', 'eddratio':'edd', 'qion':'ion'}
+
+
+
+	def __setattr__(self, name, value):
+		self._set(**{name: value})
+
+
+
+	def _set(self, **kw):
+		"""
+	Sets attributes, discarding the cached quantities which depend on 
+	them: changing the data arrays discards the interpolated arrays (unless 
+	they are also given) and the derived quantities. For the (linear, log)
+	pairs of arrays, the other member of the pair is discarded unless it 
+	is also given.
+		"""
+		d=self.__dict__
+		names=set(kw)
+
+		if names & set(self._data) and not names & set(self._interpolated):
+			for name in self._interpolated: d.pop(name,None)
+		if names & (set(self._data)|set(self._interpolated)):
+			for name in self._derived: d.pop(name,None)
+			d.pop('_lums',None)
+		if names & {'lumbol','mass'} and not names & {'lumedd','eddratio'}:
+			d.pop('lumedd',None)
+			d.pop('eddratio',None)
+		for name in names:
+			if name in self._pairs and self._pairs[name] not in names:
+				d.pop(self._pairs[name],None)
+
+		d.update(kw)
+
+
+
+	def __getattr__(self, name):
+		"""
+	Called only for attributes which are not stored. Computes on demand 
+	the missing member of a (linear, log) pair of arrays, the interpolated 
+	arrays (with the arguments of the last call to interp) and the derived
+	quantities.
+		"""
+		d=self.__dict__
+
+		if name in self._pairs and d.get(self._pairs[name]) is not None:
+			other=d[self._pairs[name]]
+			d[name]=numpy.log10(other) if name in self._logs else 10.**other
+			return d[name]
+		elif name in self._interpolated or name in self._derived:
+			# nothing can be computed for a SED without data
+			if not self._hasdata(): raise AttributeError(name)
+
+			if name in self._interpolated:
+				self.interp(**d.get('_interpargs',{}))
+				return getattr(self,name)
+			else:
+				getattr(self,self._derived[name])()
+				return d[name]
+
+		raise AttributeError(name)
+
+
+
+	def _hasdata(self):
+		"""
+	True if the observed arrays (in linear or log scale) are stored.
+		"""
+		d=self.__dict__
+		return (d.get('lognu') is not None or d.get('nu') is not None) and \
+			(d.get('ll') is not None or d.get('nlnu') is not None)
+
+
+
+	def _isinterp(self):
+		"""
+	True if the interpolated arrays are stored (see interp).
+		"""
+		return 'lli' in self.__dict__ or 'nlnui' in self.__dict__
 		
 	def __init__(self, file=None, logfmt=0, lognu=None, ll=None):
 		"""
@@ -69,29 +178,24 @@ class SED:
 		self.lognu=lognu
 		self.ll=ll
 
-		# If the SED is imported from a file...
-		if file!=None:
+		# If the SED is imported from a file... (logs or linear values are 
+		# computed when needed)
+		if file is not None:
 			if logfmt==0:
 				# Reads SED from datafile
 				self.nu,self.nlnu = numpy.loadtxt(file,unpack=True,usecols=(0,1))
-		
-				# Take logs
-				self.lognu, self.ll = numpy.log10(self.nu), numpy.log10(self.nlnu)
 			else:
 				self.lognu, self.ll = numpy.loadtxt(file,unpack=True,usecols=(0,1))
-				self.nu,self.nlnu = 10.**self.lognu, 10.**self.ll
 
 		# If the SED is created from the arrays
-		if file==None and lognu!=None:
+		if file is None and lognu is not None:
 			if logfmt==1:
 				self.lognu, self.ll = lognu, ll
-				self.nu,self.nlnu = 10.**self.lognu, 10.**self.ll
 			else:
 				self.nu, self.nlnu = lognu, ll
-				self.lognu,self.ll = numpy.log10(self.lognu), numpy.log10(self.ll)
 		
 		# Checks if ll has NaN or Inf values
-		if file!=None or lognu!=None:
+		if file is not None or lognu is not None:
 			self.check()
 
 
@@ -109,7 +213,6 @@ class SED:
 		self.file=file
 		
 		self.nu,self.nlnu,self.nlnuex,self.ul = numpy.loadtxt(file,unpack=True,usecols=(0,1,2,4))
-		self.lognu, self.ll = numpy.log10(self.nu), numpy.log10(self.nlnu)
 		self.llex = numpy.log10(self.nlnuex)
 		
 		# Checks if ll has NaN or Inf values
@@ -134,7 +237,6 @@ class SED:
 		flux=flux*1e-26*1e-6*1e7*1e-4	# microJy to erg/s/cm^2/Hz
 		dist=dist*3.086e24	# Mpc to cm
 		self.lnu=4.*numpy.pi*dist**2*flux
-		self.lognu=numpy.log10(self.nu)
 		self.ll=numpy.log10(self.lnu)+self.lognu
 		
 
@@ -174,7 +276,6 @@ class SED:
 
 		# gets log(nu) and log(nuLnu)
 		self.lognu, self.ll = lw, ll5
-		self.nu,self.nlnu = 10**self.lognu,10**self.ll
 		
 		# Checks if ll has NaN or Inf values
 		self.check()
@@ -244,28 +345,19 @@ class SED:
 		"""
 		# Index of sorted elements
 		i=self.lognu.argsort()
-		self.nu,self.nlnu = self.nu[i],self.nlnu[i]
-		self.lognu,self.ll = self.lognu[i],self.ll[i]
-		
-		# Precaution in case the user used the interp method
-		if hasattr(self, 'nlnui'): 
-			self.nui,self.nlnui = self.nui[i],self.nlnui[i]
-			self.lognui,self.lli = self.lognui[i],self.lli[i]
+		d=self.__dict__
+
+		# Sorts the stored arrays. The interpolated arrays and derived 
+		# quantities are discarded and computed again if needed.
+		names=[x for x in self._data+self._pointarrays if x in d and numpy.size(d[x])==i.size]
+		self._set(**dict((x,d[x][i]) for x in names))
 		
 
 		
 	def unit(self):
 		"""Normalizes the spectrum to one."""
-
-		# Precaution in case the user did not use the interp method
-		if not hasattr(self, 'nlnui'): self.interp()
-	
-		self.nlnu=self.nlnu/self.nlnu.max()
-		self.ll=numpy.log10(self.nlnu)
-		
-		# Normalizes the interpolated values
-		self.nlnui=self.nlnui/self.nlnui.max()
-		self.lli=numpy.log10(self.nlnui)
+		# Normalizes the observed and interpolated values
+		self._set(nlnu=self.nlnu/self.nlnu.max(), nlnui=self.nlnui/self.nlnui.max())
 
 
 
@@ -288,7 +380,7 @@ class SED:
 
 
 
-	def interp(self, seds=None, points=1000, xrange=[8,22]):
+	def interp(self, seds=None, points=1000, xrange=[8,22], threads=None):
 		"""
 	Interpolates the SED and a list of SEDs (optional) in the given range
 	of values of log(nu) and for the given number of points.
@@ -303,15 +395,21 @@ class SED:
 	:param seds: list of SED objects to interpolate
 	:param points: number of interpolated points
 	:param xrange: list in the form [xinitial, xfinal] with the x-range of interpolation. 
+	:param threads: number of threads used when interpolating a list of SEDs (see :func:`batchinterp`)
 	
 	If provided with no list of SEDs (e.g., s.interp()), then the method
 	interpolates only the current SED s. If provided with no xrange argument,
 	it will by default assume the range [8,22] discarding data points outside
 	that range in the interpolation, hence adjust accordingly.
+
+	A list of SEDs is interpolated in a single vectorized pass with 
+	:func:`batchinterp`. In this case, the interpolated arrays of each SED 
+	are rows of common 2D arrays and the frequency arrays (lognui, nui) are 
+	shared by all SEDs.
 		"""
 		# If seds==None, then the method operates only on the object itself 
 		# (e.g., s.interp()) and proper actions are taken to avoid problems
-		if seds==None:
+		if seds is None:
 			# Defines the new array of interpolated frequencies (with a 
 			# preferentially large number of points)
 			xold, yold = self.lognu, self.ll
@@ -321,18 +419,15 @@ class SED:
 			# Interpolates the current SED (simple linear interpolation).
 			# Interpolated y-values outside the original x-range are zeroes (-20
 			# in log space of luminosities).			
-			self.lognui, self.lli = xnew, ynew	# log scale
-			self.nui, self.nlnui = 10.**xnew, 10.**ynew
+			self._set(lognui=xnew, lli=ynew, _interpargs={'points':points, 'xrange':xrange})	# log scale
 		else:
 			# Interpolates the other SEDs with the same binning. But only does
 			# that if a list of SEDs was actually provided!
-			for sed in seds:
-				xold, yold = sed.lognu, sed.ll
-				xnew=numpy.linspace(xrange[0],xrange[-1],points)
-				ynew=numpy.interp(xnew,xold,yold,left=-20,right=-20)
+			xnew, ynew = batchinterp(seds, points, xrange, threads=threads)
+			nui, nlnui = 10.**xnew, 10.**ynew
 			
-				sed.lognui, sed.lli = xnew, ynew	# log scale
-				sed.nui, sed.nlnui = 10.**xnew, 10.**ynew
+			for i,sed in enumerate(seds):
+				sed._set(lognui=xnew, lli=ynew[i], nui=nui, nlnui=nlnui[i], _interpargs={'points':points, 'xrange':xrange})
 
 
 
@@ -365,45 +460,24 @@ class SED:
 	s.interp([s1,s2])) if needed.
 		"""
 		# Precaution in case the user did not use the interp method
-		if not hasattr(self, 'nlnui'): self.interp(seds)
+		if seds is not None:
+			todo=[sed for sed in seds if not sed._isinterp()]
+			if len(todo)>0: self.interp(todo)
 		
 		# If seds==None, then the method operates on the object itself, 
 		# otherwise it operates on a list of objects
-		if seds==None:
-			if xray==None:	# if xray keyword is not provided
+		if seds is None: seds=[self]
+
+		for sed in seds:
+			if xray is None:	# if xray keyword is not provided
 				# Finds the nuLnu corresponding to the frequency nearest nuref.
 				# Uses the interpolated arrays for this purpose.
-				i=lsd.search(nuref, self.lognui)
-			
-				self.nlnu=self.nlnu*refnlnu/self.nlnui[i]
-				self.nlnui=self.nlnui*refnlnu/self.nlnui[i]
-				self.lli=numpy.log10(self.nlnui)
-				self.ll=numpy.log10(self.nlnu)
+				i=lsd.search(nuref, sed.lognui)
+				factor=refnlnu/sed.nlnui[i]	# normalization factor
 			else:	# if xray keyword IS provided
-				self.xrays()
-				factor=refnlnu/self.lumx	# normalization factor
-				
-				self.nlnu=self.nlnu*factor
-				self.nlnui=self.nlnui*factor
-				self.lli=numpy.log10(self.nlnui)
-				self.ll=numpy.log10(self.nlnu)
-		else:
-			for sed in seds:
-				if xray==None:	# if xray keyword is not provided
-					i=lsd.search(nuref, sed.lognui)
-			
-					sed.nlnu=sed.nlnu*refnlnu/sed.nlnui[i]
-					sed.nlnui=sed.nlnui*refnlnu/sed.nlnui[i]
-					sed.lli=numpy.log10(sed.nlnui)
-					sed.ll=numpy.log10(sed.nlnu)
-				else:	# if xray keyword IS provided
-					sed.xrays()
-					factor=refnlnu/sed.lumx	# normalization factor
-				
-					sed.nlnu=sed.nlnu*factor
-					sed.nlnui=sed.nlnui*factor
-					sed.lli=numpy.log10(sed.nlnui)
-					sed.ll=numpy.log10(sed.nlnu)
+				factor=refnlnu/sed.xrays()[0]	# normalization factor
+
+			sed._set(nlnu=sed.nlnu*factor, nlnui=sed.nlnui*factor)
 		
 
 		
@@ -425,20 +499,7 @@ class SED:
 		"""	
 		self.normalize(seds,nuref,refnlnu)	# normalize them to a common nu
 		
-		s=self.sum(seds)
-		lognu=s.lognu
-		m=s.nlnu/len(seds)	# takes the average
-		
-		# Computes the standard deviation
-		sd=numpy.zeros_like(m)	# initializes the sd array		
-		for sed in seds:
-			sd=sd+(sed.nlnui-m)**2
-		sd=numpy.sqrt(sd/len(seds))
-		
-		meansed=SED(lognu=lognu, ll=numpy.log10(m), logfmt=1)
-		sdsed=SED(lognu=lognu, ll=numpy.log10(sd), logfmt=1)
-		
-		return [meansed,sdsed]		
+		return SEDStack.fromseds(seds).meanlin()
 		#return SED(lognu=lognu, ll=numpy.log10(m))
 		
 
@@ -473,24 +534,7 @@ class SED:
 		"""
 		self.normalize(seds,nuref,refnlnu,xray)	# normalize them to a common nu
 			
-		# Sum the values of log10(nuLnu)
-		sums=numpy.zeros_like(seds[0].lli)	# initializes the sum
-		for sed in seds:
-			sums=sums+sed.lli
-
-		lognu=seds[0].lognui		
-		m=sums/len(seds)	# takes the average
-		
-		# Computes the standard deviation
-		sd=numpy.zeros_like(sums)	# initializes the std. dev. array
-		for sed in seds:
-			sd=sd+(sed.lli-m)**2
-		sd=numpy.sqrt(sd/len(seds))
-		
-		meansed=SED(lognu=lognu, ll=m, logfmt=1)
-		sdsed=SED(lognu=lognu, ll=sd, logfmt=1)
-		
-		return [meansed,sdsed]
+		return SEDStack.fromseds(seds).mean()
 		#return SED(lognu=lognu, ll=m)
 
 
@@ -523,28 +567,7 @@ class SED:
 		"""
 		self.normalize(seds,nuref,refnlnu,xray)	# normalize them to a common nu
 		
-		# Array that stores the median of luminosities
-		m=numpy.zeros_like(seds[0].lli)
-		
-		# Loop that uses the numpy.median method
-		for i in numpy.arange(m.size):
-			x=numpy.zeros_like(numpy.array(seds))
-			for j in numpy.arange(numpy.size(seds)):
-				x[j]=seds[j].lli[i]
-			m[i]=numpy.median(x)
-
-		lognu=seds[0].lognui
-
-		# Computes the standard deviation
-		sd=numpy.zeros_like(m)	# initializes the std. dev. array
-		for sed in seds:
-			sd=sd+(sed.lli-m)**2
-		sd=numpy.sqrt(sd/len(seds))
-		
-		meansed=SED(lognu=lognu, ll=m, logfmt=1)
-		sdsed=SED(lognu=lognu, ll=sd, logfmt=1)
-		
-		return [meansed,sdsed]
+		return SEDStack.fromseds(seds).median()
 
 
 
@@ -582,24 +605,7 @@ class SED:
 		"""	
 		self.normalize(seds,nuref,refnlnu,xray)	# normalize them to a common nu
 		
-		# Calculates the product of log(nuLnu) (produtorio)
-		sums=seds[0].lli.copy()	# initializes the sum
-		for i in numpy.arange(1,len(seds)):
-			sums=sums*seds[i].lli
-
-		lognu=seds[0].lognui		
-		m=sums**(1./len(seds)) 	# takes the nth root
-		
-		# Computes the standard deviation
-		sd=sums.copy()	# initializes the std. dev. array
-		for sed in seds:
-			sd=sd+(sed.lli-m)**2
-		sd=numpy.sqrt(sd/len(seds))
-		
-		meansed=SED(lognu=lognu, ll=m, logfmt=1)
-		sdsed=SED(lognu=lognu, ll=sd, logfmt=1)
-		
-		return [meansed,sdsed]
+		return SEDStack.fromseds(seds).geomean()
 
 
 
@@ -610,7 +616,7 @@ class SED:
 	
 	
 	
-	def bol(self, lognu0=None, lognu1=None, xrange=[8,22]):
+	def bol(self, lognu0=None, lognu1=None, xrange=[8,22], method='grid'):
 		"""
 	Calculates the bolometric luminosity of the SED. Performs the integration 
 	using the trapezoidal rule. Adds the attribute lumbol to the object with
@@ -622,35 +628,60 @@ class SED:
 	
 	>>> s.bol(17, 20)
 
-	makes s.lumbol hold the luminosity integrated in the range 1e17-1e20 Hz.
+	returns the luminosity integrated in the range 1e17-1e20 Hz. Only the
+	luminosity of the whole SED with the default method is stored in 
+	s.lumbol, the other results are kept in a cache.
 
 	>>> s.bol(18, 20, [s.lognu[0],s.lognu[-1]])
 
 	gives the integrated luminosity in the range 1e18-1e20 Hz. Before integrating,
 	interpolates the SED over its original frequency range with 1000 points.
 
+	>>> s.bol(method='powerlaw')
+
+	integrates instead the observed points directly, without interpolating:
+	the SED is a power-law between consecutive points (the same linear 
+	interpolation in log-log used by interp) which is integrated 
+	analytically, see :func:`plint`. This is exact for the interpolated SED
+	and its cost depends only on the number of observed points. It is the
+	limit of the default method for an infinitely fine grid (the 1000-point
+	grid is typically off by ~0.1%, and by a few % for SEDs with sharp 
+	features), except that all points are integrated when no limits are 
+	given (xrange is ignored).
+
+	:param lognu0, lognu1: integration limits in log(nu/Hz)
+	:param xrange: range of interpolation, if the SED was not interpolated yet
+	:param method: 'grid' (trapezoidal rule on the interpolated SED) or 'powerlaw' (analytic integration between the observed points)
 		"""
-		import scipy.integrate
-
-		# Performs interpolation before integrating. This is a precaution in 
-		# case the user specifies weird integration limits.	In addition, I 
-		# found out that integrating certain sparse SEDs (e.g. qsos) without
-		# interpolating induces incorrect Lbol estimates		
-		if not hasattr(self, 'nlnui'): self.interp(xrange=xrange)			
-		
-		# If no arguments are given to the method, integrates the entire SED
-		if lognu0==None and lognu1==None:
-			lumbol=scipy.integrate.trapz(self.nlnui/self.nui, self.nui)
+		# Luminosities already computed (discarded if the SED changes)
+		lums=self.__dict__.setdefault('_lums',{})
+		key=('bol',lognu0,lognu1) if method=='grid' else ('bol',lognu0,lognu1,method)
+
+		if key in lums:
+			pass
+		elif method=='powerlaw':
+			lums[key]=plint(self.lognu, self.ll, lognu0, lognu1)
 		else:
-			# Gets only the elements in the given range
-			i=numpy.where((self.lognui>=lognu0) & (self.lognui<=lognu1))
+			# Performs interpolation before integrating. This is a precaution in 
+			# case the user specifies weird integration limits.	In addition, I 
+			# found out that integrating certain sparse SEDs (e.g. qsos) without
+			# interpolating induces incorrect Lbol estimates		
+			if not self._isinterp(): self.interp(xrange=xrange)			
+
+			# If no arguments are given to the method, integrates the entire SED
+			if lognu0 is None and lognu1 is None:
+				lums[key]=_trapz(self.nlnui/self.nui, self.nui)
+			else:
+				# Gets only the elements in the given range
+				i=numpy.where((self.lognui>=lognu0) & (self.lognui<=lognu1))
 			
-			# Integration
-			lumbol=scipy.integrate.trapz(self.nlnui[i]/self.nui[i], self.nui[i])
+				# Integration
+				lums[key]=_trapz(self.nlnui[i]/self.nui[i], self.nui[i])
 
-		self.lumbol=lumbol
+		# lumbol is always the bolometric luminosity of the whole SED
+		if key==('bol',None,None): self.lumbol=lums[key]
 
-		return lumbol
+		return lums[key]
 
 
 
@@ -664,15 +695,12 @@ class SED:
 
 	:param mass: log10(BH mass in solar masses)
 		"""
-		# Computes Lbol before anything else	
-		if not hasattr(self, 'lumbol'): 			
-			lumbol=self.bol()
-
 		# if no mass argument was given
-		if mass==None: 
+		if mass is None: 
 			mass=self.mass
 
-		# Eddington ratio
+		# Eddington ratio (Lbol of the whole SED is computed if needed)
+		lumbol=self.lumbol
 		self.lumedd=1.3e38*10**mass
 		self.eddratio=lumbol/self.lumedd
 
@@ -690,28 +718,30 @@ class SED:
 
 	creates the new attributes s.lumx and s.gammax
 		"""
-		import scipy.integrate
 		import scipy.stats
 		
-		# Performs interpolation before integrating. This is a precaution in 
-		# case the user specify weird integration limits.			
-		if not hasattr(self, 'nlnui'): self.interp()
-		
-		# 2-10 keV in log(nu)
-		xi, xf = 17.684, 18.384
+		# The interpolated arrays are computed if needed. Results already
+		# computed are reused (discarded if the SED changes)
+		lums=self.__dict__.setdefault('_lums',{})
+
+		if 'x' not in lums:
+			# 2-10 keV in log(nu)
+			xi, xf = bands['x']
 		
-		# Gets only the elements in the range 2-10 keV
-		i=numpy.where((self.lognui>=xi) & (self.lognui<=xf))
-		x,y = self.lognui[i],self.lli[i]	# easier notation
+			# Gets only the elements in the range 2-10 keV
+			i=numpy.where((self.lognui>=xi) & (self.lognui<=xf))
+			x,y = self.lognui[i],self.lli[i]	# easier notation
 		
-		# Calculates Lx using integration (trapezoidal rule)
-		self.lumx=scipy.integrate.trapz(self.nlnui[i]/self.nui[i], self.nui[i])
+			# Calculates Lx using integration (trapezoidal rule)
+			lumx=_trapz(self.nlnui[i]/self.nui[i], self.nui[i])
 
-		# Linear fit to the SED in the interval 2-10 keV, y=ax+b
-		a, b, r, p, err = scipy.stats.linregress(x,y)
+			# Linear fit to the SED in the interval 2-10 keV, y=ax+b
+			a, b, r, p, err = scipy.stats.linregress(x,y)
 		
-		# Calculates Gamma_X (photon index)
-		self.gammax=2-a
+			# Calculates Gamma_X (photon index)
+			lums['x']=(lumx, 2-a)
+
+		self.lumx, self.gammax = lums['x']
 
 		return self.lumx, self.gammax
 		
@@ -729,9 +759,6 @@ class SED:
 
 	will look for the freq. and lum. nearest nu=10^14 Hz
 		"""
-		# Performs interpolation before the search
-		if not hasattr(self, 'nlnui'): self.interp()
-		
 		# Looks for the frequency
 		i=lsd.search(x,self.lognui)	# index
 		
@@ -785,29 +812,30 @@ class SED:
 
 	def ion(self):
 		"""
-	Calculates the rate of ionizing photons in the SED.
+	Calculates the rate of ionizing photons in the SED. Also stored in the
+	attribute qion.
 	
 	>>> q=s.ion()
 		"""
-		import scipy.integrate
-		import scipy.stats
 		h=6.62607e-27	# Planck constant in CGS
 		
-		# Performs interpolation before integrating. This is a precaution in 
-		# case the user specify weird integration limits.			
-		if not hasattr(self, 'nlnui'): self.interp()
-		
-		# 13.6 eV - "infty"
-		xi, xf = 15.52, 22.
+		# The interpolated arrays are computed if needed. Results already
+		# computed are reused (discarded if the SED changes)
+		lums=self.__dict__.setdefault('_lums',{})
+
+		if 'ion' not in lums:
+			# 13.6 eV - "infty"
+			xi, xf = bands['ion']
 		
-		# Gets only the elements corresponding to ionizing frequencies
-		i=numpy.where((self.lognui>=xi) & (self.lognui<=xf))
-		x,y = self.lognui[i],self.lli[i]	# easier notation
+			# Gets only the elements corresponding to ionizing frequencies
+			i=numpy.where((self.lognui>=xi) & (self.lognui<=xf))
 		
-		# Calculates ionizing rate using integration (trapezoidal rule)
-		q=scipy.integrate.trapz(self.nlnui[i]/self.nui[i]/(h*self.nui[i]), self.nui[i])
+			# Calculates ionizing rate using integration (trapezoidal rule)
+			lums['ion']=_trapz(self.nlnui[i]/self.nui[i]/(h*self.nui[i]), self.nui[i])
 
-		return q
+		self.qion=lums['ion']
+
+		return self.qion
 
 
 		
@@ -815,6 +843,91 @@ class SED:
 	
 	
 	
+	def realize(self, n=1000, err=None, seed=None):
+		"""
+	Draws Monte Carlo realisations of the observed SED from the 
+	uncertainties in log(nuLnu). Detections are drawn from gaussians 
+	centered on ll with standard deviation llerr, whereas upper limits are
+	drawn uniformly in nuLnu between zero and the limit.
+
+	>>> ll=s.realize(1000, seed=42)
+
+	gives a (1000, s.lognu.size) array with one realisation of log(nuLnu) 
+	per row, with the frequencies in the same order as s.lognu.
+
+	:param n: number of realisations
+	:param err: uncertainty in log(nuLnu) (dex), scalar or array. By default, uses the attribute llerr
+	:param seed: seed or numpy.random.Generator
+	:returns: 2D array of log(nuLnu)
+		"""
+		rng=numpy.random.default_rng(seed)
+		if err is None: err=getattr(self,'llerr',None)
+		if err is None: 
+			raise ValueError('No uncertainties: provide err or the attribute llerr')
+
+		ll=numpy.asarray(self.ll, dtype=float)
+		ul=getattr(self,'ul',None)
+		ul=numpy.zeros(ll.size,dtype=bool) if ul is None else numpy.asarray(ul)!=0
+
+		draws=ll+numpy.broadcast_to(err,ll.shape)*rng.standard_normal((n,ll.size))
+
+		# upper limits
+		if ul.any():
+			draws[:,ul]=ll[ul]+numpy.log10(1.-rng.random((n,ul.sum())))
+
+		return draws
+
+
+
+
+	def mc(self, n=1000, err=None, seed=None, points=1000, xrange=[8,22], processes=None, blocksize=None):
+		"""
+	Monte Carlo propagation of the uncertainties of the SED into the 
+	derived quantities. Draws n realisations of the SED (see 
+	:meth:`realize`), interpolates all of them with a single matrix product
+	and computes their luminosities, X-ray photon indexes and alpha_ox 
+	at once (see :class:`SEDStack`).
+
+	>>> d=s.mc(10000, seed=42)
+	>>> numpy.percentile(d['lumbol'], [16,50,84])
+
+	The realisations are processed in blocks, which bounds the memory used.
+	Each block draws from its own random stream spawned from seed, hence 
+	the results do not depend on the number of processes.
+
+	:param n: number of realisations
+	:param err: uncertainty in log(nuLnu) (dex). By default, uses the attribute llerr
+	:param seed: integer seed, for reproducible results
+	:param points: number of interpolated points
+	:param xrange: list in the form [xinitial, xfinal] with the x-range of interpolation
+	:param processes: if given, the blocks are distributed over a pool with this number of processes
+	:param blocksize: number of realisations in each block. By default, about 1e6 interpolated points per block
+	:returns: dictionary with arrays of n values of lumbol, lumx, gammax, alphaox and qion
+		"""
+		if err is None: err=getattr(self,'llerr',None)
+		if err is None: 
+			raise ValueError('No uncertainties: provide err or the attribute llerr')
+		if blocksize is None: blocksize=max(1, 2**20//points)
+
+		sizes=[min(blocksize,n-i) for i in range(0,n,blocksize)]
+		seeds=numpy.random.SeedSequence(seed).spawn(len(sizes))
+		ul=getattr(self,'ul',None)
+		jobs=[(self.lognu, self.ll, ul, err, k, ss, points, xrange) for k,ss in zip(sizes,seeds)]
+
+		if processes is None or len(jobs)<2:
+			results=[_mcblock(job) for job in jobs]
+		else:
+			from concurrent.futures import ProcessPoolExecutor
+
+			with ProcessPoolExecutor(processes) as pool:
+				results=list(pool.map(_mcblock, jobs))
+
+		return dict((name, numpy.concatenate([r[name] for r in results])) for name in results[0])
+
+
+
+
+
 	def chisq(self, model, npars=None):
 		"""
 	Computes the goodness of fit between the observed SED (assumed to be "self") 
@@ -833,6 +946,8 @@ class SED:
 	NOTE: this method was written assuming that the observed SEDs correspond
 	to Eracleous' SEDs. Needs to be adapted in order to be applied to other 
 	types of SEDs. We discard the 100 keV interpolation done by EHF10.
+
+	To compare the SED with a large library of models, use :func:`chisqgrid`.
 		"""
 		obs=self
 		
@@ -874,6 +989,172 @@ class SED:
 
 
 
+	def compact(self, dtype=float):
+		"""
+	Returns a compact version of the SED (see :class:`CompactSED`), 
+	useful for storing large populations of SEDs.
+		"""
+		return CompactSED.fromsed(self, dtype=dtype)
+
+
+
+
+class CompactSED:
+	"""
+Memory-efficient representation of a SED, for large (e.g. synthetic) 
+populations of SEDs. Only the log-space data (log(nu), log(nuLnu) and, 
+if present, the upper limit flags and errors in log(nuLnu)) are stored, 
+as the rows of a single contiguous array. The attributes lognu, ll, ul and 
+llerr are views of these rows, whereas the linear values nu and nlnu are 
+computed each time they are accessed (not stored). The object uses 
+__slots__, hence there is no per-instance dictionary: only the 
+attributes file, mass and distance can be set besides the arrays.
+
+>>> c=s.compact()
+>>> c=sed.CompactSED(lognu, ll)
+>>> plot(c.lognu, c.ll)
+
+To compute luminosities, interpolate etc, convert to a full SED object:
+
+>>> s=c.tosed()
+	"""
+
+	__slots__=('_buf','_rows','file','mass','distance')
+
+	def __init__(self, lognu, ll, ul=None, llerr=None, file=None, mass=None, distance=None, dtype=float):
+		"""
+	:param lognu, ll: arrays with log10(nu/Hz) and log10(nuLnu/erg/s)
+	:param ul, llerr: optional arrays with the upper limit flags and the errors in log10(nuLnu)
+	:param dtype: data type of the buffer, e.g. numpy.float32 halves the memory
+		"""
+		rows=[('lognu',lognu),('ll',ll),('ul',ul),('llerr',llerr)]
+		rows=[(name,x) for name,x in rows if x is not None]
+
+		self._rows=tuple(name for name,x in rows)
+		self._buf=numpy.array([numpy.ravel(x) for name,x in rows], dtype=dtype)
+		self.file=file
+		self.mass=mass
+		self.distance=distance
+
+	@staticmethod
+	def fromsed(sed, dtype=float):
+		"""
+	Creates a compact SED from a SED object.
+		"""
+		d=dict((name,getattr(sed,name,None)) for name in ('ul','llerr','file','mass','distance'))
+
+		return CompactSED(sed.lognu, sed.ll, dtype=dtype, **d)
+
+	def tosed(self):
+		"""
+	Converts to a SED object (with copies of the arrays).
+		"""
+		s=SED(lognu=self.lognu.copy(), ll=self.ll.copy(), logfmt=1)
+		for name in ('ul','llerr'):
+			if name in self._rows: setattr(s, name, self._row(name).copy())
+		for name in ('file','mass','distance'):
+			if getattr(self,name,None) is not None: setattr(s, name, getattr(self,name))
+
+		return s
+
+	def __len__(self):
+		return self._buf.shape[1]
+
+	def _row(self, name):
+		if name not in self._rows: raise AttributeError(name)
+		return self._buf[self._rows.index(name)]
+
+	def _setrow(self, name, x):
+		if name in self._rows and numpy.size(x)==len(self):
+			self._buf[self._rows.index(name)]=x
+		else:	# rebuilds the buffer
+			rows=dict((row,self._buf[i]) for i,row in enumerate(self._rows))
+			rows[name]=x
+			self.__init__(rows['lognu'], rows['ll'], rows.get('ul'), rows.get('llerr'), self.file, self.mass, self.distance, self._buf.dtype)
+
+	lognu=property(lambda self: self._row('lognu'), lambda self,x: self._setrow('lognu',x))
+	ll=property(lambda self: self._row('ll'), lambda self,x: self._setrow('ll',x))
+	ul=property(lambda self: self._row('ul'), lambda self,x: self._setrow('ul',x))
+	llerr=property(lambda self: self._row('llerr'), lambda self,x: self._setrow('llerr',x))
+
+	@property
+	def nu(self):
+		return 10.**self.lognu.astype(float)
+
+	@property
+	def nlnu(self):
+		return 10.**self.ll.astype(float)	# in float64, which does not overflow
+
+
+
+
+def _trapz(y, x):
+	"""
+Integral of y(x) with the trapezoidal rule (same as scipy.integrate.trapz,
+which was removed from recent versions of scipy).
+	"""
+	return numpy.sum(0.5*(y[1:]+y[:-1])*numpy.diff(x))
+
+
+
+
+def plint(lognu, ll, lognu0=None, lognu1=None, photons=False):
+	"""
+Integrates a SED analytically, assuming it is a power-law between 
+consecutive points, i.e. linear in log(nuLnu) vs log(nu) as in 
+:meth:`SED.interp`. Between points i and i+1 with slope a, 
+nuLnu=nuLnu_i (nu/nu_i)^a and the integral of Lnu dnu is
+
+nuLnu_i [(nu_{i+1}/nu_i)^a - 1]/a
+
+(or nuLnu_i ln(nu_{i+1}/nu_i) if a=0). Segments partially outside the 
+integration limits are truncated.
+
+>>> lum=plint(s.lognu, s.ll, 17.684, 18.384)
+
+gives the 2-10 keV luminosity.
+
+:param lognu: log10(nu/Hz) of the points (need not be sorted)
+:param ll: log10(nuLnu / erg/s) of the points
+:param lognu0, lognu1: integration limits. By default, the whole SED
+:param photons: if True, integrates Lnu/(h nu) instead, i.e. gives the rate of photons
+:returns: integrated luminosity in erg/s (or photons/s)
+	"""
+	h=6.62607e-27	# Planck constant in CGS
+
+	x=numpy.asarray(lognu, dtype=float)
+	y=numpy.asarray(ll, dtype=float)
+	dx=numpy.diff(x)
+	if (dx<0).any():
+		i=numpy.argsort(x, kind='stable')
+		x,y=x[i],y[i]
+		dx=numpy.diff(x)
+	if lognu0 is None: lognu0=x[0]
+	if lognu1 is None: lognu1=x[-1]
+
+	# slope of each segment
+	a=numpy.divide(numpy.diff(y), dx, out=numpy.zeros_like(dx), where=dx>0)
+
+	# segments truncated at the integration limits (empty ones discarded)
+	x0=numpy.clip(x[:-1], lognu0, lognu1)
+	x1=numpy.clip(x[1:], lognu0, lognu1)
+	j=x1>x0
+	x0,x1,a=x0[j],x1[j],a[j]
+	y0=y[:-1][j]+a*(x0-x[:-1][j])
+
+	# integrand nuLnu/nu^p in units of nu^-1
+	p=1 if photons else 0
+	b=a-p
+	lnr=(x1-x0)*numpy.log(10.)
+	z=b*lnr
+	f=numpy.divide(numpy.expm1(z), z, out=numpy.ones_like(z), where=numpy.abs(z)>1e-12)
+
+	lum=numpy.sum(10.**(y0-p*x0)*lnr*f)
+
+	return lum/h if photons else lum
+
+
+
 
 def sum(seds):
 	"""
@@ -892,17 +1173,930 @@ if needed.
 	# Precaution in case the user did not use the interp method
 	seds[0].interp(seds)
 		
-	sums=numpy.zeros_like(seds[0].lognui)	# initializes the sum
+	return SEDStack.fromseds(seds).sum()
 
-	for sed in seds:
-		sums=sums+sed.nlnui
 		
-	return SED(lognu=seds[0].lognui, ll=numpy.log10(sums), logfmt=1)
 
+
+
+
+
+def batchinterp(seds, points=1000, xrange=[8,22], out=None, threads=None, blocksize=None):
+	"""
+Interpolates a list of SEDs on the same grid of log(nu), like 
+:meth:`SED.interp`, in a vectorized way. The SEDs can have different 
+numbers of points: their arrays are concatenated (keeping the offset of
+each SED) and the interpolation brackets of all SEDs are found at once.
+
+>>> lognu,ll=batchinterp(seds)
+
+returns the common grid lognu and the 2D array ll[i,j] with the 
+interpolated log(nuLnu) of the i-th SED. Interpolated values outside the 
+range of each SED are -20.
+
+:param seds: list of SED objects
+:param points: number of interpolated points
+:param xrange: list in the form [xinitial, xfinal] with the x-range of interpolation
+:param out: optional preallocated (len(seds), points) array that will hold the result
+:param threads: if given, the SEDs are split in blocks which are interpolated in a pool with this number of threads. Worth it for very large lists
+:param blocksize: number of SEDs interpolated in each pass, which bounds the memory used. By default, about 1e6 interpolated points per block
+:returns: lognu, ll
+	"""
+	lognu=numpy.linspace(xrange[0],xrange[-1],points)
+	n=len(seds)
+	if out is None: out=numpy.empty((n,points))
+	if blocksize is None: blocksize=max(1, 2**20//points)
+
+	blocks=[slice(i,min(i+blocksize,n)) for i in range(0,n,blocksize)]
+
+	if threads is None or threads<2 or len(blocks)<2:
+		for i in blocks:
+			_interpblock(seds[i], lognu, out[i])
+	else:
+		from concurrent.futures import ThreadPoolExecutor
+
+		with ThreadPoolExecutor(threads) as pool:
+			jobs=[pool.submit(_interpblock, seds[i], lognu, out[i]) for i in blocks]
+			for job in jobs: job.result()
+
+	return lognu, out
+
+
+
+
+def _interpblock(seds, xnew, out):
+	"""
+Linear interpolation of the list of SEDs on the grid xnew, storing the
+result in the 2D array out. Equivalent to numpy.interp(xnew,lognu,ll,
+left=-20,right=-20) for each SED.
+	"""
+	n=len(seds)
+	sizes=numpy.array([numpy.size(sed.lognu) for sed in seds])
+	seg=numpy.repeat(numpy.arange(n), sizes)	# SED to which each point belongs
+	x=numpy.concatenate([numpy.ravel(sed.lognu) for sed in seds]).astype(float)
+	y=numpy.concatenate([numpy.ravel(sed.ll) for sed in seds]).astype(float)
+
+	# sorts the points of each SED in ascending frequency
+	i=numpy.lexsort((x,seg))
+	x,y=x[i],y[i]
+	start=numpy.concatenate(([0],numpy.cumsum(sizes)[:-1]))[:,None]
+	end=start+sizes[:,None]-1	# last point of each SED
+
+	# slope of each segment of the SEDs (zero at their last points)
+	slope=numpy.zeros_like(y)
+	with numpy.errstate(invalid='ignore', divide='ignore'):
+		slope[:-1]=numpy.diff(y)/numpy.diff(x)
+	slope[end.ravel()]=0.
+	slope[~numpy.isfinite(slope)]=0.
+
+	# For each grid point, counts how many points of each SED are below it.
+	# Since the grid is uniform, the first grid point above each data point
+	# is found with arithmetic, instead of searching.
+	points=xnew.size
+	h=(xnew[-1]-xnew[0])/(points-1) if points>1 else 1.
+	g=numpy.clip(numpy.ceil((x-xnew[0])/h),0,points).astype(int)
+	counts=numpy.bincount(seg*(points+1)+g, minlength=n*(points+1)).reshape(n,points+1)
+	j=start+numpy.cumsum(counts[:,:points],axis=1)	# first point above each grid point
+
+	# lower point of the interpolation bracket, kept inside each SED
+	ilo=numpy.clip(j-1,start,end)
+	out[:]=y[ilo]+slope[ilo]*(xnew-x[ilo])
+
+	# outside the frequency range of each SED
+	out[(xnew<x[start]) | (xnew>x[end])]=-20
+
+
+
+
+class SEDStack:
+	"""
+Collection of N SEDs interpolated on the same grid of frequencies, stored 
+as a single (N, points) array. Operations over the whole collection 
+(normalization, mean, median, percentiles etc) are carried out with 
+numpy reductions along the first axis instead of loops over SED objects, 
+hence they are fast even for many thousands of SEDs.
+
+The attributes are:
+
+- lognu: 1D array with the common grid of log10(frequency/Hz)
+- ll: 2D array with log10(nu Lnu / erg/s), one SED per row
+- nu, nlnu: the same in linear scale (computed on demand)
+
+Creates a stack from a list of SED objects, interpolating them on the 
+default grid of :meth:`SED.interp` (1000 points over log(nu)=8-22):
+
+>>> st=sed.SEDStack(seds)
+
+or directly from arrays:
+
+>>> st=sed.SEDStack(lognu=lognu, ll=ll2d)
+
+Normalizes the SEDs at 2 keV and gets the average SED and its standard 
+deviation, as SED objects:
+
+>>> st.normalize(17.684,1e40)
+>>> mean,sd=st.mean()
+
+The 16th, 50th and 84th percentiles:
+
+>>> p16,p50,p84=st.percentile([16,50,84])
+	"""
+
+	def __init__(self, seds=None, lognu=None, ll=None, points=1000, xrange=[8,22]):
+		"""
+	:param seds: list of SED objects which will be interpolated
+	:param lognu: 1D array with the common log(nu) grid (if seds is not given)
+	:param ll: 2D array of log(nuLnu) with shape (N, lognu.size) (if seds is not given)
+	:param points: number of interpolated points
+	:param xrange: list in the form [xinitial, xfinal] with the x-range of interpolation
+		"""
+		if seds is not None:
+			self.lognu, self.ll = batchinterp(seds, points, xrange)
+		else:
+			self.lognu=numpy.asarray(lognu)
+			self.ll=numpy.atleast_2d(ll)
+
+		# integration weights of each band on the frequency grid
+		self._weights={}
+
+
+
+	@staticmethod
+	def fromseds(seds):
+		"""
+	Creates a stack from SEDs that were *already* interpolated in the same
+	binning (e.g. with s.interp(seds)), using their lognui and lli 
+	attributes.
+		"""
+		return SEDStack(lognu=seds[0].lognui, ll=numpy.array([sed.lli for sed in seds]))
+
+
+
+	def __len__(self):
+		return self.ll.shape[0]
+
+	def __getitem__(self, i):
+		"""
+	Returns the i-th SED as a SED object, or a new stack if i is a slice
+	or an array of indexes.
+		"""
+		if numpy.ndim(i)==0 and not isinstance(i,slice):
+			return SED(lognu=self.lognu, ll=self.ll[i], logfmt=1)
+		else:
+			return SEDStack(lognu=self.lognu, ll=self.ll[i])
+
+	@property
+	def nu(self):
+		return 10.**self.lognu
+
+	@property
+	def nlnu(self):
+		return 10.**self.ll
+
+
+
+	def normalize(self, nuref=17.684, refnlnu=1e40, xray=None):
+		"""
+	Normalizes all SEDs at the given frequency (lognu/Hz) and nuLnu (erg/s),
+	as in :meth:`SED.normalize`. If xray=True, normalizes the SEDs such 
+	that they have the same X-ray luminosity refnlnu in the range 2-10 keV.
+	NOTE: this modifies the stack.
+		"""
+		if xray is None:
+			i=lsd.search(nuref, self.lognu)
+			self.ll=self.ll+(numpy.log10(refnlnu)-self.ll[:,i])[:,None]
+		else:
+			lumx,gammax=self.xrays()
+			self.ll=self.ll+numpy.log10(refnlnu/lumx)[:,None]
+
+		# luminosities computed before are no longer valid
+		for name in ('lumbol','lumx','gammax','lumedd','eddratio'):
+			self.__dict__.pop(name,None)
+
+		return self
+
+
+
+	def weights(self, lognu0=None, lognu1=None, photons=False):
+		"""
+	Weights w of the trapezoidal rule on the frequency grid such that the 
+	luminosity integrated in the range lognu0-lognu1 of all SEDs is 
+	``nlnu.dot(w)``, i.e. the integral of Lnu dnu. If photons=True, the
+	weights give instead the rate of photons, the integral of Lnu/(h nu) dnu.
+
+	The weights are computed once for each band and cached.
+		"""
+		key=(lognu0,lognu1,photons)
+
+		if key not in self._weights:
+			h=6.62607e-27	# Planck constant in CGS
+
+			if lognu0 is None: lognu0=self.lognu[0]
+			if lognu1 is None: lognu1=self.lognu[-1]
+			j=numpy.where((self.lognu>=lognu0) & (self.lognu<=lognu1))[0]
+			nu=self.nu[j]
+
+			w=numpy.zeros_like(self.lognu)
+			if j.size>1:
+				dnu=numpy.diff(nu)
+				w[j[:-1]]+=0.5*dnu
+				w[j[1:]]+=0.5*dnu
+			w[j]=w[j]/nu	# nuLnu -> Lnu
+			if photons: w[j]=w[j]/(h*nu)
+
+			self._weights[key]=w
+
+		return self._weights[key]
+
+
+
+	def lum(self, bands=bands):
+		"""
+	Luminosities integrated in several bands for all SEDs at once, with
+	a single matrix product. 
+
+	>>> l=st.lum()
+	>>> l['x']
+
+	gives the 2-10 keV luminosities of all SEDs.
+
+	:param bands: dictionary of bands in the form {name: [lognu0,lognu1]}. By default, uses sed.bands
+	:returns: dictionary with arrays of luminosities in erg/s
+		"""
+		names=list(bands)
+		w=numpy.column_stack([self.weights(*bands[name]) for name in names])
+		l=self.nlnu.dot(w)
+
+		return dict((name,l[:,k]) for k,name in enumerate(names))
+
+
+
+	def bol(self, lognu0=None, lognu1=None):
+		"""
+	Bolometric luminosities (or integrated in the range lognu0-lognu1) of 
+	all SEDs, as in :meth:`SED.bol`. The luminosities of the whole SEDs 
+	are also stored in the attribute lumbol.
+		"""
+		lum=self.nlnu.dot(self.weights(lognu0,lognu1))
+		if lognu0 is None and lognu1 is None: self.lumbol=lum
+
+		return lum
+
+
+
+	def xrays(self):
+		"""
+	2-10 keV luminosities and X-ray photon indexes of all SEDs, as in 
+	:meth:`SED.xrays`. Also stored in the attributes lumx and gammax.
+
+	>>> lumx,gammax=st.xrays()
+		"""
+		xi, xf = bands['x']
+		self.lumx=self.nlnu.dot(self.weights(xi,xf))
+
+		# Slope of the linear fits to the SEDs in the interval 2-10 keV
+		j=numpy.where((self.lognu>=xi) & (self.lognu<=xf))[0]
+		x=self.lognu[j]-self.lognu[j].mean()
+		y=self.ll[:,j]
+		a=y.dot(x)/numpy.sum(x**2)
+
+		# photon indexes
+		self.gammax=2-a
+
+		return self.lumx, self.gammax
+
+
+
+	def ion(self):
+		"""
+	Rates of ionizing photons of all SEDs, as in :meth:`SED.ion`.
+		"""
+		return self.nlnu.dot(self.weights(*bands['ion'], photons=True))
+
+
+
+	def alphaox(self):
+		"""
+	alpha_ox indexes of all SEDs, as in :meth:`SED.alphaox`.
+		"""
+		# 2 keV and 2500 AA
+		i, j = lsd.search(17.684,self.lognu), lsd.search(15.079,self.lognu)
+
+		# log(Lnu(2 keV)/Lnu(2500 AA))
+		return (self.ll[:,i]-self.ll[:,j]-(self.lognu[i]-self.lognu[j]))/2.605
+
+
+
+	def edd(self, mass):
+		"""
+	Eddington ratios of all SEDs, using the bolometric luminosities.
+
+	:param mass: array with log10(BH mass in solar masses)
+		"""
+		# always the luminosity integrated over the whole SED, not a band
+		# that may have been integrated last
+		lumbol=self.bol()
+
+		self.lumedd=1.3e38*10**numpy.asarray(mass)
+		self.eddratio=lumbol/self.lumedd
+
+		return self.eddratio
+
+
+
+	def _sedpair(self, m, sd):
+		"""
+	Returns the list [meansed,sdsed] of SED objects, like SED.mean.
+		"""
+		meansed=SED(lognu=self.lognu, ll=m, logfmt=1)
+		sdsed=SED(lognu=self.lognu, ll=sd, logfmt=1)
+		
+		return [meansed,sdsed]
+
+	def mean(self):
+		"""
+	Average of log10(nuLnu) (as in Eracleous et al. 2010). Returns the list
+	[mean,sd] of SED objects with the mean and the standard deviation.
+		"""
+		return self._sedpair(self.ll.mean(axis=0), self.ll.std(axis=0))
+
+	def median(self):
+		"""
+	Median of log10(nuLnu). Returns the list [median,sd] of SED objects with
+	the median and the standard deviation about the median.
+		"""
+		m=numpy.median(self.ll,axis=0)
+		sd=numpy.sqrt(numpy.mean((self.ll-m)**2,axis=0))
+
+		return self._sedpair(m,sd)
+
+	def geomean(self):
+		"""
+	Geometric mean of log10(nuLnu). Returns the list [mean,sd] of SED
+	objects with the geometric mean and the standard deviation about it.
+		"""
+		# nth root of the product, computed in log space to avoid overflows.
+		# As with the root of the product, the result is NaN if the product
+		# is negative
+		with numpy.errstate(divide='ignore'):
+			m=numpy.exp(numpy.mean(numpy.log(numpy.abs(self.ll)),axis=0))
+		m[numpy.sum(self.ll<0,axis=0)%2==1]=numpy.nan
+		sd=numpy.sqrt(numpy.mean((self.ll-m)**2,axis=0))
+
+		return self._sedpair(m,sd)
+
+	def meanlin(self):
+		"""
+	Average of the luminosities in linear space, log10(average nuLnu).
+	Returns the list [mean,sd] of SED objects with the mean and the 
+	standard deviation (both in log10).
+		"""
+		nlnu=self.nlnu
 		
+		return self._sedpair(numpy.log10(nlnu.mean(axis=0)), numpy.log10(nlnu.std(axis=0)))
+
+	def std(self):
+		"""
+	Standard deviation of log10(nuLnu) as a 1D array.
+		"""
+		return self.ll.std(axis=0)
+
+	def sum(self):
+		"""
+	SED object with the sum of the luminosities, log10(sum nuLnu).
+		"""
+		return SED(lognu=self.lognu, ll=numpy.log10(self.nlnu.sum(axis=0)), logfmt=1)
+
+	def percentile(self, q):
+		"""
+	Percentile(s) of log10(nuLnu) at each frequency. 
+
+	:param q: percentile or list of percentiles (0-100)
+	:returns: SED object or list of SED objects
+		"""
+		p=numpy.percentile(self.ll, q, axis=0)
+
+		if numpy.ndim(q)==0:
+			return SED(lognu=self.lognu, ll=p, logfmt=1)
+		else:
+			return [SED(lognu=self.lognu, ll=x, logfmt=1) for x in p]
+
+
+
+
+
+
+
+def _interpmatrix(xp, x):
+	"""
+Matrix w of linear interpolation weights from the sorted points xp to 
+the points x, such that w.dot(fp) equals numpy.interp(x,xp,fp) for any 
+fp, i.e. constant beyond the first and last points. Has shape 
+(x.size, xp.size).
+	"""
+	xp=numpy.asarray(xp, dtype=float)
+	x=numpy.atleast_1d(numpy.asarray(x, dtype=float))
+	w=numpy.zeros((x.size,xp.size))
+
+	if xp.size==1:
+		w[:,0]=1.
+		return w
+
+	# lower point of the interpolation bracket of each x
+	j=numpy.clip(numpy.searchsorted(xp,x,side='right')-1, 0, xp.size-2)
+	with numpy.errstate(invalid='ignore', divide='ignore'):
+		t=numpy.clip(numpy.nan_to_num((x-xp[j])/(xp[j+1]-xp[j])), 0., 1.)
+	k=numpy.arange(x.size)
+	w[k,j]=1.-t
+	w[k,j+1]+=t
+
+	return w
+
+
+
+
+def chisqgrid(obs, models, npars=None, uplims=False, processes=None):
+	"""
+Computes the goodness of fit between observed SED(s) and a whole library 
+of models at once, as in :meth:`SED.chisq` (modified chi square, i.e. 
+assuming unit uncertainties, discarding the upper limits and the 
+points with log(nu)>=19). The models are interpolated onto the 
+frequencies of each observed SED with a single matrix product and the
+chi squares of all models are computed in one vectorized operation.
+
+>>> best,chisq,rank=chisqgrid(s, models)
+
+gives the index of the best-fit model, the array of chi squares of all 
+models and the indexes of the models sorted from the best to the worst 
+fit. With a list of observed SEDs, the results are arrays with one row 
+for each observed SED:
+
+>>> best,chisq,rank=chisqgrid([s1,s2,s3], models, npars=4, processes=4)
+
+:param obs: observed SED or list of observed SEDs
+:param models: SEDStack with the model library or list of model SEDs. A list of models is interpolated from the points of each model directly onto the observed frequencies (constant beyond the range of each model), exactly as in :meth:`SED.chisq`. A SEDStack is instead interpolated from its common grid, where the models are -20 outside their original ranges (see :func:`batchinterp`)
+:param npars: number of free parameters in the models. If given, returns the reduced chi square
+:param uplims: if True, the upper limits are taken into account: they contribute to the chi square only where the model is above them
+:param processes: number of processes used to distribute the observed SEDs
+:returns: best-fit model index, chi square(s) and ranking of models
+	"""
+	single=isinstance(obs, SED)
+	if single: obs=[obs]
 
+	if isinstance(models, SEDStack):
+		grid, ll = models.lognu, models.ll
+	else:
+		# the models tabulated at all the observed frequencies, from their
+		# own points
+		grid=numpy.unique(numpy.concatenate([numpy.ravel(o.lognu) for o in obs]))
+		ll=numpy.array([numpy.interp(grid, m.lognu, m.ll) for m in models])
+
+	jobs=[(o.lognu, o.ll, getattr(o,'ul',None), grid, ll, npars, uplims) for o in obs]
+	if processes is None:
+		chisq=[_chisqgrid(job) for job in jobs]
+	else:
+		from concurrent.futures import ProcessPoolExecutor
+
+		with ProcessPoolExecutor(processes) as pool:
+			chisq=list(pool.map(_chisqgrid, jobs))
+
+	chisq=numpy.array(chisq)
+	rank=numpy.argsort(chisq, axis=1, kind='stable')
+	best=rank[:,0]
+
+	if single:
+		return best[0], chisq[0], rank[0]
+	else:
+		return best, chisq, rank
+
+
+
+
+def _chisqgrid(job):
+	"""
+Chi squares of all models for one observed SED, see :func:`chisqgrid`.
+	"""
+	lognu, ll, ul, grid, models, npars, uplims = job
+	if ul is None: ul=numpy.zeros_like(ll)
+
+	# good data points and upper limits
+	i=numpy.where((ul==0) & (lognu<19.))[0]
+	iul=numpy.where((ul!=0) & (lognu<19.))[0] if uplims else numpy.array([],dtype=int)
+	x=lognu[numpy.concatenate((i,iul))]
+
+	# matrix of linear interpolation weights from the model grid to the
+	# observed frequencies
+	w=_interpmatrix(grid, x)
+
+	ymod=models.dot(w.T)	# (models, observed points)
+
+	# Chi-square
+	chisq=numpy.sum((ll[i]-ymod[:,:i.size])**2, axis=1)
+	if uplims:
+		excess=numpy.maximum(ymod[:,i.size:]-ll[iul], 0.)
+		chisq=chisq+numpy.sum(excess**2, axis=1)
+
+	if npars is not None:	# or reduced chi-square statistic
+		nu=i.size-1-npars		# Number of degrees of freedom
+		chisq=chisq/nu
+
+	return chisq
+
+
+
+
+def _mcblock(job):
+	"""
+Derived quantities of a block of Monte Carlo realisations of a SED, see
+:meth:`SED.mc`.
+	"""
+	lognu, ll, ul, err, n, seed, points, xrange = job
+
+	sed=SED()
+	sed._set(lognu=lognu, ll=ll, ul=ul, llerr=numpy.broadcast_to(err, numpy.shape(ll)))
+	draws=sed.realize(n, seed=numpy.random.default_rng(seed))
+
+	# matrix of linear interpolation weights from the observed frequencies 
+	# to the grid, shared by all realisations
+	i=numpy.argsort(lognu, kind='stable')
+	x=numpy.asarray(lognu, dtype=float)[i]
+	xnew=numpy.linspace(xrange[0],xrange[-1],points)
+	w=_interpmatrix(x, xnew)
+
+	st=SEDStack(lognu=xnew, ll=draws[:,i].dot(w.T))
+	st.ll[:,(xnew<x[0]) | (xnew>x[-1])]=-20	# outside the range of the SED
+
+	lumx, gammax = st.xrays()
+
+	return {'lumbol': st.bol(), 'lumx': lumx, 'gammax': gammax, 'alphaox': st.alphaox(), 'qion': st.ion()}
+
+
+
+
+def readseds(files, fmt='erac', cache=None, processes=None, info=None, logfmt=0):
+	"""
+Reads a catalogue of SEDs in one of the formats understood by the SED 
+class. The files can be parsed in parallel with a pool of processes, and
+the parsed arrays can be stored in a single binary cache file (numpy 
+.npz), such that reloading the catalogue afterwards is one fast file 
+read. Files that were modified after the cache was written (according to
+their modification times) are parsed again and the cache is updated.
+
+>>> seds=readseds('data/*.dat', 'erac', cache='erac.npz', processes=8)
+
+Reads the radio SEDs of the Hayden et al. sample, taking the distances 
+and masses from the information table:
+
+>>> seds=readseds('all/*_sed.txt', 'hayden', info='info.dat')
+
+:param files: glob pattern or list of filenames
+:param fmt: format of the files: 'file' (plain two-column file, see logfmt), 'erac', 'hayden', 'haydenx' or 'grmonty'
+:param cache: name of the .npz cache file
+:param processes: number of processes used to parse the files. If None, the files are read serially
+:param info: information table with distances and masses (see :func:`haydeninfo`), required by the 'hayden' format
+:param logfmt: for the 'file' format, 1 if the data is already in logarithm or 0 otherwise
+:returns: list of SED objects
+	"""
+	import os, glob
+
+	if isinstance(files,str):
+		files=sorted(glob.glob(files))
+	mtimes=[os.path.getmtime(f) for f in files]
+
+	# options which change the parsed SEDs: the cache is only valid for the
+	# same ones (including the version of the information table)
+	options={'fmt': fmt, 'logfmt': logfmt, 'info': '' if info is None else os.path.abspath(info), 
+		'infomtime': 0. if info is None else os.path.getmtime(info)}
+
+	# parsed attributes of each file, reusing the cache when it is up to date
+	cached={}
+	if cache is not None and os.path.exists(cache):
+		cached=_loadcache(cache, options)
+	attrs=[None]*len(files)
+	jobs=[]
+	for k,f in enumerate(files):
+		if f in cached and cached[f][0]==mtimes[k]:
+			attrs[k]=cached[f][1]
+		else:
+			if fmt=='hayden':
+				source=os.path.basename(f).split('_')[0].upper()
+				dist,mass=haydeninfo(info)[source]
+				jobs.append((k,(f,fmt,{'dist':dist, 'mass':mass})))
+			else:
+				jobs.append((k,(f,fmt,{'logfmt':logfmt})))
+
+	if len(jobs)>0:
+		if processes is None:
+			results=[_readsed(job) for k,job in jobs]
+		else:
+			from concurrent.futures import ProcessPoolExecutor
+
+			with ProcessPoolExecutor(processes) as pool:
+				results=list(pool.map(_readsed, [job for k,job in jobs], chunksize=max(1,len(jobs)//(4*processes))))
+		for (k,job),a in zip(jobs,results):
+			attrs[k]=a
+
+		if cache is not None:
+			_savecache(cache, options, files, mtimes, attrs)
+
+	seds=[]
+	for a in attrs:
+		sed=SED()
+		sed._set(**a)
+		seds.append(sed)
+
+	return seds
+
+
+
+
+def _readsed(job):
+	"""
+Reads one SED file given the tuple (file, format, keyword arguments) and
+returns the dictionary of attributes of the resulting SED object. Used by
+:func:`readseds` (must be at the module level to be pickled by the pool).
+	"""
+	file,fmt,kwargs=job
+
+	if fmt=='file':
+		sed=SED(file=file, logfmt=kwargs['logfmt'])
+	elif fmt=='hayden':
+		sed=SED()
+		sed.hayden(file, kwargs['dist'])
+		sed.mass=kwargs['mass']
+	else:
+		sed=SED()
+		getattr(sed,fmt)(file)
+
+	return sed.__dict__
+
+
+
+
+def _savecache(cache, options, files, mtimes, attrs):
+	"""
+Stores the attributes of the SEDs read by :func:`readseds` in the .npz 
+file cache, together with the reading options (format, logfmt, 
+information table and its modification time). Arrays are concatenated 
+over all SEDs (with their lengths stored separately), so that the cache 
+is made of a few large arrays.
+	"""
+	d={'files': numpy.array(files), 'mtimes': numpy.array(mtimes)}
+	for name in options:
+		d['option_'+name]=numpy.array(options[name])
+	names=set()
+	for a in attrs: names.update(a)
+	names.discard('file')	# same as the filename
+
+	for name in names:
+		has=numpy.array([name in a for a in attrs])
+		values=[a[name] for a in attrs if name in a]
+
+		if all(isinstance(v,numpy.ndarray) for v in values):
+			d['array_'+name]=numpy.concatenate([numpy.ravel(v) for v in values])
+			d['len_'+name]=numpy.array([numpy.size(a[name]) if name in a else -1 for a in attrs])
+		else:	# scalars
+			fill=values[0]
+			d['scalar_'+name]=numpy.array([a.get(name,fill) for a in attrs])
+			d['has_'+name]=has
+
+	numpy.savez(cache, **d)
+
+
+
+
+def _loadcache(cache, options):
+	"""
+Reads the .npz cache written by :func:`_savecache`. Returns the dictionary
+{filename: (mtime, attributes)}, empty if the cache was created with 
+different reading options.
+	"""
+	d=numpy.load(cache)
+	for name in options:
+		if 'option_'+name not in d.files or d['option_'+name].item()!=options[name]: return {}
+
+	files=d['files'].tolist()
+	attrs=[{'file':f} for f in files]
+
+	for key in d.files:
+		if key.startswith('array_'):
+			name=key[6:]
+			data,lens=d[key],d['len_'+name]
+			offsets=numpy.concatenate(([0],numpy.cumsum(numpy.maximum(lens,0))))
+			for k in numpy.flatnonzero(lens>=0):
+				attrs[k][name]=data[offsets[k]:offsets[k+1]]
+		elif key.startswith('scalar_'):
+			name=key[7:]
+			values,has=d[key],d['has_'+name]
+			for k in numpy.flatnonzero(has):
+				attrs[k][name]=values[k].item()
+
+	return dict((f,(t,a)) for f,t,a in zip(files,d['mtimes'],attrs))
+
+
+
+
+def writeh5(file, seds, append=False, interp=True, lums=True):
+	"""
+Exports many SEDs to a single compressed HDF5 file. The observed points
+of all SEDs are concatenated (the start and number of points of each SED
+are stored), and there is one row per SED for the interpolated arrays, 
+the luminosities and the metadata. All datasets are chunked and 
+resizable, so that further SEDs can be appended to the file in 
+subsequent calls (e.g. while they are generated).
+
+>>> writeh5('seds.h5', seds)
+>>> writeh5('seds.h5', moreseds, append=True)
+
+Structure of the file:
+
+- points/lognu, points/ll, points/ul, points/llerr: observed points of all SEDs (ul and llerr are 0 if absent)
+- sources/start, sources/count: position of each SED in the points arrays
+- sources/file, sources/mass, sources/distance: metadata (NaN or empty string if absent)
+- sources/lli: interpolated log(nuLnu), one row per SED, on the grid grid/lognui
+- sources/lumbol, sources/lumx, sources/gammax: luminosities and X-ray photon index
+
+:param file: name of the HDF5 file
+:param seds: list of SED objects
+:param append: if True, appends the SEDs to an existing file, which must have been written with the same interp and lums (and the same interpolation grid)
+:param interp: if True, stores the interpolated arrays (computed with the default grid if needed). All SEDs must have the same interpolation grid
+:param lums: if True, stores lumbol, lumx and gammax (computed if needed)
+	"""
+	import h5py
+
+	counts=numpy.array([numpy.size(sed.lognu) for sed in seds])
+
+	def concat(name):
+		# concatenation of a per-point attribute of all SEDs
+		return numpy.concatenate([numpy.zeros(k) if getattr(sed,name,None) is None else numpy.ravel(getattr(sed,name)) for sed,k in zip(seds,counts)])
+
+	def scalars(name):
+		# per-SED attribute, NaN if absent
+		return numpy.array([numpy.nan if getattr(sed,name,None) is None else getattr(sed,name) for sed in seds], dtype=float)
+
+	points={'lognu': concat('lognu'), 'll': concat('ll'), 'ul': concat('ul'), 'llerr': concat('llerr')}
+	sources={'count': counts, 'mass': scalars('mass'), 'distance': scalars('distance'),
+		'file': numpy.array([str(sed.file) if sed.file is not None else '' for sed in seds], dtype=object)}
+	# the luminosities are read before the interpolated arrays, since 
+	# interpolating a SED discards the luminosities already computed
+	if lums:
+		sources['lumbol']=numpy.array([sed.lumbol for sed in seds])
+		sources['lumx']=numpy.array([sed.lumx for sed in seds])
+		sources['gammax']=numpy.array([sed.gammax for sed in seds])
+	if interp:
+		sources['lli']=numpy.array([sed.lli for sed in seds])
+
+	with h5py.File(file, 'a' if append else 'w') as hf:
+		# offset of the new SEDs in the points arrays
+		offset=hf['points/lognu'].shape[0] if 'points/lognu' in hf else 0
+		sources['start']=offset+numpy.concatenate(([0],numpy.cumsum(counts)[:-1]))
+
+		# the SEDs appended must have the same datasets as those in the file
+		# (otherwise the rows of the datasets would no longer match) and be
+		# interpolated on the same grid
+		if offset>0:
+			if interp!=('sources/lli' in hf) or lums!=('sources/lumbol' in hf):
+				raise ValueError('%s was written with interp=%s and lums=%s, the same must be used to append' % (file, 'sources/lli' in hf, 'sources/lumbol' in hf))
+			if interp and not numpy.array_equal(hf['grid/lognui'][:], seds[0].lognui):
+				raise ValueError('the SEDs must be interpolated on the same grid as those in %s' % file)
+
+		if interp and 'grid/lognui' not in hf:
+			hf.create_dataset('grid/lognui', data=seds[0].lognui)
+
+		for group,data in (('points',points),('sources',sources)):
+			for name,x in data.items():
+				_h5append(hf, group+'/'+name, x)
+
+
+
+
+def _h5append(hf, name, x):
+	"""
+Appends the array x along the first axis of the dataset name in the 
+opened HDF5 file hf, creating a chunked, resizable dataset if needed.
+	"""
+	import h5py
+
+	if x.dtype==object:
+		x=x.astype(h5py.string_dtype())
+
+	if name not in hf:
+		hf.create_dataset(name, data=x, maxshape=(None,)+x.shape[1:], chunks=True, compression="gzip")
+	else:
+		d=hf[name]
+		n=d.shape[0]
+		d.resize(n+x.shape[0], axis=0)
+		d[n:]=x
+
+
+
+
+def readh5(file, index=None):
+	"""
+Reads SEDs from a HDF5 file created with :func:`writeh5`. Only the 
+requested SEDs are read from disk.
+
+>>> seds=readh5('seds.h5')
+>>> seds=readh5('seds.h5', slice(100,200))
+>>> seds=readh5('seds.h5', [3,17,2000])
+
+The number of SEDs in the file is given by
+
+>>> nseds('seds.h5')
+
+:param file: name of the HDF5 file
+:param index: index, slice or list of indexes of the SEDs to be read. If None, reads all SEDs
+:returns: list of SED objects (a single SED if index is an integer)
+	"""
+	import h5py
+
+	with h5py.File(file, 'r') as hf:
+		src=hf['sources']
+		n=src['count'].shape[0]
+		single=numpy.ndim(index)==0 and index is not None and not isinstance(index,slice)
+		i=numpy.arange(n) if index is None else numpy.atleast_1d(numpy.arange(n)[index])
+
+		start,count=src['start'][:][i],src['count'][:][i]
+
+		# reads the span of points that covers all the requested SEDs in one
+		# go, unless they are too scattered in the file
+		i0,i1=start.min(),(start+count).max()
+		if i1-i0<=2*count.sum():
+			points=dict((name,x[i0:i1]) for name,x in hf['points'].items())
+			get=lambda name,k: points[name][start[k]-i0:start[k]-i0+count[k]]
+		else:
+			get=lambda name,k: hf['points'][name][start[k]:start[k]+count[k]]
+
+		# per-SED datasets, read only for the requested rows (h5py needs 
+		# unique, increasing indexes)
+		iu,inverse=numpy.unique(i, return_inverse=True)
+		rows={}
+		for name,x in src.items():
+			if name in ('start','count'): continue
+			rows[name]=(x[iu] if iu.size<n else x[:])[inverse]
+		lognui=hf['grid/lognui'][:] if 'grid/lognui' in hf else None
+
+		seds=[]
+		for k in range(i.size):
+			sed=SED(lognu=get('lognu',k), ll=get('ll',k), logfmt=1)
+			sed.ul, sed.llerr = get('ul',k), get('llerr',k)
+			f=rows['file'][k]
+			sed.file=(f.decode() if isinstance(f,bytes) else f) or None
+
+			# interpolated arrays and luminosities set together, otherwise
+			# the former would discard the latter
+			a={}
+			if 'lli' in rows:
+				a['lognui'], a['lli'] = lognui, rows['lli'][k]
+			for name in ('mass','distance','lumbol','lumx','gammax'):
+				if name in rows and not numpy.isnan(rows[name][k]): 
+					a[name]=rows[name][k].item()
+			sed._set(**a)
+			seds.append(sed)
+
+	if single:
+		return seds[0]
+	else:
+		return seds
+
+
+
+
+def nseds(file):
+	"""
+Number of SEDs stored in a HDF5 file created with :func:`writeh5`.
+	"""
+	import h5py
+
+	with h5py.File(file, 'r') as hf:
+		return hf['sources/count'].shape[0]
+
+
+
+
+# information tables already read by haydeninfo, {filename: (mtime, index)}
+_infotables={}
+
+def haydeninfo(info='/Users/nemmen/work/projects/hayden/info.dat'):
+	"""
+Reads the information table of the Hayden et al. sample and returns a 
+dictionary indexed by the source name (uppercase, no spaces) with the 
+tuples (distance/Mpc, log10(mass)). The table is read only once (or again 
+if the file is modified).
+
+>>> dist,mass=haydeninfo(info)['NGC1097']
+	"""
+	import os
+
+	mtime=os.path.getmtime(info)
+	if info not in _infotables or _infotables[info][0]!=mtime:
+		import astropy.io.ascii as ascii
 
+		t=ascii.read(info)
+		index=dict((name,(dist,mass)) for name,dist,mass in zip(t['name'].tolist(),t['distance/Mpc'].tolist(),t['logmass'].tolist()))
+		_infotables[info]=(mtime,index)
 
+	return _infotables[info][1]
 
 
 
@@ -918,7 +2112,6 @@ quantities.
 
 :returns: SED object 
 	"""
-	import astropy.io.ascii as ascii
 	# READS SEDS
 	# =============
 	# Finds the required parameters to plot the data for the specified source.
@@ -926,15 +2119,9 @@ quantities.
 	source=source.upper()
 	source=source.replace(' ', '')
 
-	# Reads information table and gets required info
-	t=ascii.read(info)
-	names=t['name'].tolist()
-	# finds location of source in the arrays
-	i=names.index(source)
-	# gets distance 
-	dist=t['distance/Mpc'][i]
-	# gets BH mass
-	mass=t['logmass'][i]
+	# Gets distance and BH mass from the information table (which is read
+	# only once)
+	dist,mass=haydeninfo(info)[source]
 
 	# Reads observed SED from radio to X-rays 
 	# (which is given in weird units)
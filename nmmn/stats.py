@@ -4,6 +4,7 @@ Statistical methods
 
 - fit residuals
 - Computing prediction and confidence bands
+- online linear regression
 - Comparing goodness-of-fit of different models
 - operations on statistical distributions
 - custom statistical distributions
@@ -12,6 +13,7 @@ Statistical methods
 
 import numpy,scipy
 import scipy.stats
+from . import lsd # intrapackage reference
 
 
 
@@ -143,21 +145,18 @@ See http://en.wikipedia.org/wiki/Goodness_of_fit for reference.
 If a linear model is not provided via A,B (y=ax+b) then the method computes
 the chi-square using the best-fit line.
 
-x,y,sd assumed to be Numpy arrays. a,b scalars.
+x,y,sd assumed to be Numpy arrays. a,b scalars, or arrays with the 
+parameters of many models, in which case returns an array with the
+chi-square of each model.
 Returns the float chisq with the chi-square statistic.
 	"""
 
-	if a==None:	
+	if a is None:	
 		# Performs linear regression
 		a, b, r, p, err = scipy.stats.linregress(x,y)
 	
 	# Chi-square statistic (Bevington, eq. 6.9)
-	if sd==None:
-		chisq=numpy.sum((y-a*x-b)**2)
-	else:
-		chisq=numpy.sum( ((y-a*x-b)/sd)**2 )
-	
-	return chisq
+	return chisqg(y,_linmodel(x,a,b),sd)
 
 
 
@@ -170,20 +169,34 @@ then the chi-square error statistic is computed as the sum of squared errors
 divided by the standard deviations.	Inspired on the IDL procedure linfit.pro.
 See http://en.wikipedia.org/wiki/Goodness_of_fit for reference.
 
-x,y,sd assumed to be Numpy arrays. a,b scalars.
+ydata,ymod,sd assumed to be Numpy arrays. ymod can also be a 2D array with
+one model per row (n_models, n_points), in which case returns an array with
+the chi-square of each model.
 Returns the float chisq with the chi-square statistic.
 	"""
 	# Chi-square statistic (Bevington, eq. 6.9)
-	if sd==None:
-		chisq=numpy.sum((ydata-ymod)**2)
+	if sd is None:
+		chisq=numpy.sum((ydata-ymod)**2, axis=-1)
 	else:
-		chisq=numpy.sum( ((ydata-ymod)/sd)**2 )
+		chisq=numpy.sum( ((ydata-ymod)/sd)**2, axis=-1 )
 	
 	return chisq
 
 
 
 
+def _linmodel(x,a,b):
+	"""
+Linear model y=ax+b evaluated at x, for scalar parameters (1D output) or 
+arrays of parameters (2D output with one model per row).
+	"""
+	a,b=numpy.asarray(a),numpy.asarray(b)
+
+	return numpy.multiply.outer(a,x)+b[...,None]
+
+
+
+
 
 
 def chisqxy(x,y,errx,erry,a,b):
@@ -201,10 +214,12 @@ where
 
 - xdata,ydata : data
 - errx,erry : measurement uncertainties in the data
-- a,b : slope and intercept of the best-fit linear regression model
+- a,b : slope and intercept of the best-fit linear regression model,
+  or arrays with the parameters of many models (returns then an array)
 	"""
-	sdsq=erry**2+a**2*errx**2
-	chisq=numpy.sum( (y-a*x-b)**2/sdsq )
+	a=numpy.asarray(a)
+	sdsq=erry**2+numpy.multiply.outer(a**2,errx**2)
+	chisq=numpy.sum( (y-_linmodel(x,a,b))**2/sdsq, axis=-1 )
 	
 	return chisq
 
@@ -326,7 +341,7 @@ v2 Jun. 2012: corrected bug in computing dy
 	alpha=1.-conf	# significance
 	n=xd.size	# data sample size
 
-	if x==None: x=numpy.linspace(xd.min(),xd.max(),100)
+	if x is None: x=numpy.linspace(xd.min(),xd.max(),100)
 
 	# Predicted values (best-fit model)
 	y=a*x+b
@@ -389,7 +404,7 @@ E. Dallal, Ph.D. <http://www.JerryDallal.com/LHSP/slr.htm>`_
 	alpha=1.-conf	# significance
 	n=xd.size	# data sample size
 
-	if x==None: x=numpy.linspace(xd.min(),xd.max(),100)
+	if x is None: x=numpy.linspace(xd.min(),xd.max(),100)
 
 	# Predicted values (best-fit model)
 	y=a*x+b
@@ -412,7 +427,112 @@ E. Dallal, Ph.D. <http://www.JerryDallal.com/LHSP/slr.htm>`_
 
 
 
-def confbandnl(xd,yd,fun,par,varcov,deg,conf=0.95,x=None):
+def evalmodel(fun,x,par):
+	"""
+Evaluates the model fun at all elements of the array x, for the 
+parameters par. fun uses the same convention as in :func:`confbandnl`,
+fun(v) with v[0]=x and v[i>0] the parameters. If fun works with numpy 
+arrays (a vectorized model), it is called once with v[0]=x the whole 
+array; otherwise, it is called for each element of x as in misc.evalfun.
+
+>>> y=evalmodel(fun,x,[2,3])
+
+:param fun: model
+:param x: array of x values
+:param par: array or list of parameters
+:returns: array with the model evaluated at x
+	"""
+	x=numpy.asarray(x)
+
+	try:
+		y=numpy.asarray(fun([x]+list(par)))
+		if y.shape==x.shape: return y
+	except (TypeError, ValueError):
+		pass
+
+	# model that only accepts scalars
+	return numpy.array([fun(numpy.concatenate(([xi],par))) for xi in x.ravel()]).reshape(x.shape)
+
+
+
+
+def jacobian(fun,x,par,grad=None,method='fd'):
+	"""
+Jacobian of the model fun with respect to its parameters, evaluated at
+all the elements of x at once: J[i,j] is the derivative of fun at x[i] 
+with respect to par[j]. fun uses the same convention as in 
+:func:`confbandnl` and is evaluated with :func:`evalmodel`.
+
+>>> J=jacobian(fun,x,par)
+
+:param fun: model
+:param x: array of x values
+:param par: array or list of best-fit parameters
+:param grad: optional function with the analytic gradient, grad(v) with v as in fun, returning an array with shape (len(par), x.size), i.e. one row with the derivatives with respect to each parameter
+:param method: if grad is not given, 'fd' (central finite differences, two evaluations of the model per parameter) or 'complex' (complex step, one evaluation per parameter; exact to machine precision, but fun must accept complex parameters)
+:returns: array with shape (x.size, len(par))
+	"""
+	x=numpy.atleast_1d(x)
+	par=numpy.asarray(par,dtype=float)
+	npar=par.size
+
+	if grad is not None:
+		J=numpy.asarray(grad([x]+list(par)),dtype=float)
+		if J.shape!=(npar,x.size):
+			raise ValueError('grad must return an array with shape (len(par), x.size)=%s, got %s' % ((npar,x.size),J.shape))
+		return J.T
+
+	J=numpy.empty((x.size,npar))
+	if method=='complex':
+		h=1e-20
+		for j in range(npar):
+			p=par.astype(complex)
+			p[j]+=1j*h
+			J[:,j]=numpy.imag(evalmodel(fun,x,p))/h
+	else:
+		# steps which minimize the truncation + roundoff error
+		h=numpy.finfo(float).eps**(1./3.)*numpy.maximum(numpy.abs(par),1.)
+		for j in range(npar):
+			p1,p2=par.copy(),par.copy()
+			p1[j]+=h[j]
+			p2[j]-=h[j]
+			J[:,j]=(evalmodel(fun,x,p1)-evalmodel(fun,x,p2))/(p1[j]-p2[j])
+
+	return J
+
+
+
+
+def _bandnl(xd,yd,fun,par,varcov,conf,x,grad,method):
+	"""
+Quantities shared by :func:`confbandnl` and :func:`predbandnl`: x, the 
+model y at x, the variances v=J C J^T at x, the quantile q of the 
+Student's t distribution and the residual sum of squares.
+	"""
+	alpha=1.-conf	# significance
+	n=xd.size	# data sample size
+
+	if x is None: x=numpy.linspace(xd.min(),xd.max(),100)
+
+	# Quantile of Student's t distribution for p=1-alpha/2
+	q=scipy.stats.t.ppf(1.-alpha/2.,n-2)
+
+	# Residual sum of squares		
+	rss=residual(yd, evalmodel(fun,xd,par) )
+	
+	y=evalmodel(fun,x,par)
+
+	# Gradients at all x (one row per x), contracted with the covariance 
+	# matrix in one pass
+	J=jacobian(fun,x,par,grad,method)
+	v=numpy.einsum('ij,jk,ik->i', J, numpy.asarray(varcov), J)
+
+	return x,y,v,q,rss
+
+
+
+
+def confbandnl(xd,yd,fun,par,varcov,deg,conf=0.95,x=None,grad=None,method='fd'):
 	"""
 Calculates the confidence band of a nonlinear model at the desired confidence
 level, using analytical methods. 
@@ -421,7 +541,9 @@ Arguments:
 
 - xd,yd: data arrays
 - fun : function f(v) - the model - which returns a scalar. v is an array
-  such that v[0]=x (scalar), v[i>0] = parameters of the model
+  such that v[0]=x (scalar), v[i>0] = parameters of the model. If the 
+  model also works when v[0] is an array (i.e. it is vectorized), it is 
+  evaluated for all x at once, which is much faster
 - par : array or list with structure [par0, par1, par2, ...] with the best-fit
   parameters that will be fed into fun
 - varcov : variance-covariance matrix obtained from the nonlinear fit
@@ -429,6 +551,9 @@ Arguments:
 - conf: desired confidence level, by default 0.95 (2 sigma)
 - x: (optional) array with x values to calculate the confidence band. If none is provided, will
   by default generate 100 points in the original x-range of the data.
+- grad, method: (optional) analytic gradient of the model with respect to
+  the parameters, or the method of numerical differentiation, see 
+  :func:`jacobian`
   
 Usage:
 
@@ -447,37 +572,8 @@ References:
 2. http://stats.stackexchange.com/questions/15423/how-to-compute-prediction-bands-for-non-linear-regression
 3. see also my notebook
 	"""
-	import numdifftools
-	
-	alpha=1.-conf	# significance
 	n=xd.size	# data sample size
-
-	if x==None: x=numpy.linspace(xd.min(),xd.max(),100)
-
-	# Gradient (needs to be evaluated)
-	dfun=numdifftools.Gradient(fun)
-	
-	# Quantile of Student's t distribution for p=1-alpha/2
-	q=scipy.stats.t.ppf(1.-alpha/2.,n-2)
-
-	# Residual sum of squares		
-	rss=residual(yd, evalfun(fun,xd,par) )
-	
-	grad,p=[],[]
-	i=0
-	y=evalfun(fun,x,par)
-	v=numpy.zeros_like(x)
-		
-	for i in range(x.size):
-		# List: arrays consisting of [x[i], par1, par2, ...]
-		p.append( numpy.concatenate(([x[i]],par)) )
-	
-		# List: each element -> gradient evaluated at each xi
-		grad.append(dfun(p[i]))
-				
-		# Before processing the grad array, eliminates the first element
-		temp=numpy.dot(numpy.transpose(grad[i][1:]), varcov)
-		v[i]=numpy.dot(temp, grad[i][1:])
+	x,y,v,q,rss=_bandnl(xd,yd,fun,par,varcov,conf,x,grad,method)
 		
 	# Confidence band
 	dy=q*numpy.sqrt( v*rss/(n-deg) )
@@ -490,7 +586,7 @@ References:
 
 
 
-def predbandnl(xd,yd,fun,par,varcov,deg,conf=0.95,x=None):
+def predbandnl(xd,yd,fun,par,varcov,deg,conf=0.95,x=None,grad=None,method='fd'):
 	"""
 Calculates the prediction band of a nonlinear model at the desired confidence
 level, using analytical methods. 
@@ -499,7 +595,9 @@ Arguments:
 
 - xd,yd: data arrays
 - fun : function f(v) - the model - which returns a scalar. v is an array
-  such that v[0]=x, v[i>0] = parameters of the model
+  such that v[0]=x, v[i>0] = parameters of the model. If the model also
+  works when v[0] is an array (i.e. it is vectorized), it is evaluated 
+  for all x at once, which is much faster
 - par : array or list with structure [par0, par1, par2, ...] with the best-fit
   parameters that will be fed into fun
 - varcov : variance-covariance matrix obtained from the nonlinear fit
@@ -507,6 +605,9 @@ Arguments:
 - conf: desired confidence level, by default 0.95 (2 sigma)
 - x: (optional) array with x values to calculate the confidence band. If none is provided, will
   by default generate 100 points in the original x-range of the data.
+- grad, method: (optional) analytic gradient of the model with respect to
+  the parameters, or the method of numerical differentiation, see 
+  :func:`jacobian`
   
 Usage:
 
@@ -524,39 +625,10 @@ References:
 2. http://stats.stackexchange.com/questions/15423/how-to-compute-prediction-bands-for-non-linear-regression
 3. see also my notebook)
 	"""
-	import numdifftools
-	
-	alpha=1.-conf	# significance
 	n=xd.size	# data sample size
-
-	if x==None: x=numpy.linspace(xd.min(),xd.max(),100)
-
-	# Gradient (needs to be evaluated)
-	dfun=numdifftools.Gradient(fun)
-	
-	# Quantile of Student's t distribution for p=1-alpha/2
-	q=scipy.stats.t.ppf(1.-alpha/2.,n-2)
-
-	# Residual sum of squares		
-	rss=residual(yd, evalfun(fun,xd,par) )
-	
-	grad,p=[],[]
-	i=0
-	y=evalfun(fun,x,par)
-	v=numpy.zeros_like(x)
+	x,y,v,q,rss=_bandnl(xd,yd,fun,par,varcov,conf,x,grad,method)
 		
-	for i in range(x.size):
-		# List: arrays consisting of [x[i], par1, par2, ...]
-		p.append( numpy.concatenate(([x[i]],par)) )
-	
-		# List: each element -> gradient evaluated at each xi
-		grad.append(dfun(p[i]))
-				
-		# Before processing the grad array, eliminates the first element
-		temp=numpy.dot(numpy.transpose(grad[i][1:]), varcov)
-		v[i]=numpy.dot(temp, grad[i][1:])
-		
-	# Confidence band
+	# Prediction band
 	dy=q*numpy.sqrt( (1.+v)*rss/(n-deg) )
 	upb=y+dy	# Upper prediction band
 	lpb=y-dy	# Lower prediction band
@@ -566,7 +638,7 @@ References:
 	
 
 
-def confbandmc(x,par,varcov,n=100000,sigmas=1.):
+def confbandmc(x,par,varcov,n=100000,sigmas=1.,seed=None):
 	"""
 Calculates the 1sigma confidence band of a linear model without needing
 to specify the data points, by doing a Monte Carlo simulation using the
@@ -582,6 +654,7 @@ Arguments:
 - n : number of (a,b) points generated from the multivariate gaussian
 - sigmas : number of standard deviations contained within the prediction
   band
+- seed : seed or numpy.random.Generator, for reproducible bands
 
 Output:
 
@@ -595,20 +668,23 @@ calculates the prediction bands for the given input arrays
 
 >>> pylab.fill_between(x, lcb, ucb, alpha=0.3, facecolor='gray')
 plots a shaded area containing the prediction band
+
+Since the model is linear in the parameters, the mean and standard 
+deviation of y=ax+b at every x follow from the sample mean and covariance
+of the realizations of (a,b), without evaluating the model at each x for
+every realization. The result is the same, but the cost does not grow 
+with n*x.size.
 	"""
 	# Generates many realizations of a and b from the multinormal distribution
-	ar,br = numpy.random.multivariate_normal(par,varcov,n).T
-	
-	erry=[]	# will contain the std deviation in y
-	y=[]	# values of y for each x
-	
-	for xi in x:
-		yr=ar*xi+br
-		erry.append( yr.std() )
-		y.append( yr.mean() )	
+	rng=numpy.random.default_rng(seed)
+	ar,br = rng.multivariate_normal(par,varcov,n).T
+	x=numpy.asarray(x)
+
+	# Sample moments of the realizations
+	c=numpy.cov(ar,br,bias=True)
 	
-	erry=numpy.array(erry)
-	y=numpy.array(y)
+	y=ar.mean()*x+br.mean()	# values of y for each x
+	erry=numpy.sqrt(numpy.maximum(c[0,0]*x**2+2.*c[0,1]*x+c[1,1], 0.))	# std deviation in y
 
 	ucb=y+sigmas*erry	# Upper confidence band
 	lcb=y-sigmas*erry	# Lower confidence band
@@ -618,7 +694,7 @@ plots a shaded area containing the prediction band
 	
 	
 	
-def credbandmc(x,slope,inter,sigmas=1.):
+def credbandmc(x,slope,inter,sigmas=1.,chunksize=2**22,threads=None):
 	"""
 Calculates the confidence (or credibility in case of Bayesian analysis) 
 band of a linear regression model, given the posterior probability distributions
@@ -632,6 +708,10 @@ Arguments:
   regression
 - sigmas : number of standard deviations contained within the confidence
   band
+- chunksize : maximum number of model evaluations held in memory at once
+  (per thread)
+- threads : if given, the blocks of x are processed by a pool with this
+  number of threads
 
 Output:
 
@@ -646,26 +726,52 @@ calculates the prediction bands for the given input arrays
 >>> pylab.fill_between(x, lcb, ucb, alpha=0.3, facecolor='gray')
 plots a shaded area containing the prediction band
 
+The model is evaluated for all posterior samples over blocks of x 
+values, as 2D arrays, and the percentiles of each block are computed at 
+once by sorting along the samples axis.
+
 v1 Jun. 2012: inspired by private communication with B. Kelly.
 	"""
-	a,b = slope,inter
+	a,b = numpy.asarray(slope),numpy.asarray(inter)
+	x=numpy.atleast_1d(x)
 	
 	# Define the confidence/credibility interval
 	conf=1.-scipy.special.erf(sigmas/numpy.sqrt(2.))
-	
-	lcb,ucb,ym=numpy.zeros_like(x),numpy.zeros_like(x),numpy.zeros_like(x)
-	
-	for i, xi in enumerate(x): 
-		# Distribution of y for each x
-		yp=a*xi+b	# 'p' as in posterior
-		
-		# Lower confidence band
-		lcb[i]=scipy.stats.scoreatpercentile(yp,conf*100./2.)
-		# Upper confidence band
-		ucb[i]=scipy.stats.scoreatpercentile(yp,100.*(1-conf/2.))
-		
-		ym[i]=numpy.median(yp)	
-		
+	q=[conf*100./2., 50., 100.*(1-conf/2.)]
+	
+	# lower band, median and upper band
+	band=numpy.empty((3,x.size))
+
+	# blocks of x values, each with at most chunksize model evaluations
+	step=max(1, chunksize//a.size)
+	blocks=[slice(i,i+step) for i in range(0,x.size,step)]
+
+	# Positions of the percentiles in the sorted samples, linearly 
+	# interpolated between the neighbouring order statistics (as in 
+	# numpy.percentile)
+	pos=numpy.array(q)/100.*(a.size-1)
+	lo=numpy.floor(pos).astype(int)
+	hi=numpy.minimum(lo+1,a.size-1)
+	t=(pos-lo)[:,None]
+
+	def percentiles(i):
+		# Distribution of y for each x in the block, one x per row
+		yp=x[i,None]*a+b	# 'p' as in posterior
+
+		# (a full vectorized sort is faster than partitioning at several
+		# order statistics)
+		yp.sort(axis=1)
+		band[:,i]=yp[:,lo].T+t*(yp[:,hi].T-yp[:,lo].T)
+
+	if threads is None or len(blocks)<2:
+		for i in blocks: percentiles(i)
+	else:
+		from concurrent.futures import ThreadPoolExecutor
+
+		with ThreadPoolExecutor(threads) as pool:
+			list(pool.map(percentiles, blocks))
+
+	lcb,ym,ucb=band
 
 	return lcb,ucb,ym
 	
@@ -688,11 +794,425 @@ v1 Jun. 2012: inspired by private communication with B. Kelly.
 
 
 
+# Online linear regression
+# ==========================
+# Linear fits over data sets too large to fit in memory, which are 
+# read in chunks.
+
+class OnlineLinregress:
+	"""
+Accumulates the sufficient statistics of a linear regression y=ax+b from
+data given in chunks, so that fits can be carried out over data sets 
+which do not fit in memory (e.g. billion-row catalogues read piecewise).
+Only the number of points, the means and the centered sums of squares 
+and cross products are stored, updated with the pairwise algorithm of 
+Chan et al. (the chunk version of Welford's algorithm), which avoids the
+roundoff errors of accumulating raw sums.
+
+The results are the same as those of scipy.stats.linregress, 
+:func:`linregress_error`, :func:`scatterfit`, :func:`confband` and 
+:func:`predband` applied to the whole data set.
+
+>>> fit=OnlineLinregress()
+>>> for x,y in chunks:
+>>>     fit.add(x,y)
+>>> a,b=fit.fit()
+>>> sda,sdb=fit.errors()
+>>> lcb,ucb,x=fit.confband(0.95)
+
+Accumulators of different parts of the data (e.g. computed by different
+processes) can be combined:
+
+>>> fit=fit1.merge(fit2)
+
+If the measurement uncertainties errx, erry are also given, their mean 
+squares are accumulated to estimate the intrinsic scatter, see 
+:meth:`intscat`.
+	"""
+
+	def __init__(self):
+		self.n=0	# number of points
+		self.meanx, self.meany = 0., 0.
+		# centered sums of squares and cross products
+		self.sxx, self.syy, self.sxy = 0., 0., 0.
+		# sums of the squared uncertainties
+		self.nerr, self.errx2, self.erry2 = 0, 0., 0.
+		# range of x
+		self.xmin, self.xmax = numpy.inf, -numpy.inf
+
+
+
+	def add(self, x, y, errx=None, erry=None):
+		"""
+	Adds a chunk of data points to the fit.
+
+	:param x,y: arrays with the data
+	:param errx,erry: optional arrays with the uncertainties in x and y
+		"""
+		x,y=numpy.ravel(x).astype(float),numpy.ravel(y).astype(float)
+		n=x.size
+		if n==0: return self
+
+		# statistics of the chunk
+		mx,my=x.mean(),y.mean()
+		dx,dy=x-mx,y-my
+		chunk=OnlineLinregress()
+		chunk.n, chunk.meanx, chunk.meany = n, mx, my
+		chunk.sxx, chunk.syy, chunk.sxy = numpy.dot(dx,dx), numpy.dot(dy,dy), numpy.dot(dx,dy)
+		chunk.xmin, chunk.xmax = x.min(), x.max()
+		if errx is not None or erry is not None:
+			chunk.nerr=n
+			if errx is not None: chunk.errx2=numpy.sum(numpy.square(errx))
+			if erry is not None: chunk.erry2=numpy.sum(numpy.square(erry))
+
+		return self._combine(chunk)
+
+
+
+	def merge(self, other):
+		"""
+	Returns a new accumulator with the data of this one and other.
+		"""
+		new=OnlineLinregress()
+		new.__dict__.update(self.__dict__)
+
+		return new._combine(other)
+
+
+
+	def _combine(self, other):
+		"""
+	Adds the statistics of other to this accumulator, in place.
+		"""
+		na,nb=self.n,other.n
+		n=na+nb
+		if nb==0: return self
+
+		dx=other.meanx-self.meanx
+		dy=other.meany-self.meany
+		f=na*nb/n
+
+		self.sxx+=other.sxx+dx*dx*f
+		self.syy+=other.syy+dy*dy*f
+		self.sxy+=other.sxy+dx*dy*f
+		self.meanx+=dx*nb/n
+		self.meany+=dy*nb/n
+		self.n=n
+
+		self.nerr+=other.nerr
+		self.errx2+=other.errx2
+		self.erry2+=other.erry2
+		self.xmin=min(self.xmin,other.xmin)
+		self.xmax=max(self.xmax,other.xmax)
+
+		return self
+
+
+
+	def fit(self):
+		"""
+	Best-fit slope and intercept (ordinary least squares of y on x).
+
+	:returns: a, b
+		"""
+		a=self.sxy/self.sxx
+		b=self.meany-a*self.meanx
+
+		return a, b
+
+
+
+	def rss(self, a=None, b=None):
+		"""
+	Residual sum of squares about the line y=ax+b (by default, the best fit).
+		"""
+		if a is None:
+			return max(self.syy-self.sxy**2/self.sxx, 0.)
+
+		d=self.meany-a*self.meanx-b
+		return self.syy-2.*a*self.sxy+a**2*self.sxx+self.n*d**2
+
+
+
+	def scatter(self, a=None, b=None):
+		"""
+	Mean deviation of the data about the line y=ax+b (by default, the best 
+	fit), as in :func:`scatterfit`.
+		"""
+		return numpy.sqrt(self.rss(a,b)/(self.n-2.))
+
+
+
+	def errors(self):
+		"""
+	Standard deviations in the best-fit slope and intercept, as in 
+	:func:`linregress_error`.
+
+	:returns: sda, sdb
+		"""
+		sd=self.scatter()
+		sda=sd/numpy.sqrt(self.sxx)
+		sdb=sd*numpy.sqrt(1./self.n+self.meanx**2/self.sxx)
+
+		return sda, sdb
+
+
+
+	def r(self):
+		"""
+	Pearson correlation coefficient.
+		"""
+		return self.sxy/numpy.sqrt(self.sxx*self.syy)
+
+
+
+	def intscat(self):
+		"""
+	Intrinsic scatter about the best fit, estimated as the square root of
+	the variance of the residuals in excess of the mean measurement 
+	variance erry^2+a^2 errx^2 (zero if there is no excess). Requires the 
+	uncertainties to be given to :meth:`add`.
+		"""
+		if self.nerr==0:
+			raise ValueError('No uncertainties were given: call add with errx and/or erry')
+
+		a,b=self.fit()
+		sdsq=(self.erry2+a**2*self.errx2)/self.nerr
+
+		return numpy.sqrt(max(self.scatter()**2-sdsq, 0.))
+
+
+
+	def _band(self, conf, x, pred):
+		"""
+	Half-width of the confidence (or prediction if pred=1) bands at x.
+		"""
+		alpha=1.-conf	# significance
+
+		# Quantile of Student's t distribution for p=1-alpha/2
+		q=scipy.stats.t.ppf(1.-alpha/2.,self.n-2)
+
+		return q*self.scatter()*numpy.sqrt( pred+1./self.n + (x-self.meanx)**2/self.sxx )
+
+
+
+	def confband(self, conf=0.95, x=None):
+		"""
+	Confidence band of the best fit at the desired confidence level, as in
+	:func:`confband`.
+
+	:param conf: desired confidence level, by default 0.95 (2 sigma)
+	:param x: array with x values to calculate the band. By default, 100 points in the x-range of the data
+	:returns: lcb, ucb, x
+		"""
+		x=self._xband(x)
+		a,b=self.fit()
+		y=a*x+b
+		dy=self._band(conf,x,0.)
+
+		return y-dy, y+dy, x
+
+
+
+	def predband(self, conf=0.95, x=None):
+		"""
+	Prediction band of the best fit at the desired confidence level, as in
+	:func:`predband`.
+
+	:param conf: desired confidence level, by default 0.95 (2 sigma)
+	:param x: array with x values to calculate the band. By default, 100 points in the x-range of the data
+	:returns: lpb, upb, x
+		"""
+		x=self._xband(x)
+		a,b=self.fit()
+		y=a*x+b
+		dy=self._band(conf,x,1.)
+
+		return y-dy, y+dy, x
+
+
+
+	def _xband(self, x):
+		# by default, the x-range of the data as in confband and predband
+		if x is None:
+			x=numpy.linspace(self.xmin,self.xmax,100)
+
+		return numpy.asarray(x)
+
+
+
+
+
+
+
+
+
 # Monte Carlo simulations, generate random numbers
 # ===================================================	
 	
 
-def gauss2d(par,varcov,n=10000):
+class MultiNormal:
+	"""
+Multivariate normal distribution in any number of dimensions, for 
+generating large numbers of random points and computing their 
+probabilities. The covariance matrix is factorized once (Cholesky), 
+instead of at every call as in numpy.random.multivariate_normal.
+Singular (positive semi-definite) covariance matrices, e.g. of perfectly
+correlated parameters, are factorized instead from their eigenvectors: 
+the points then lie on a subspace with dimension rank < d, and the 
+distances, PDF and levels refer to that subspace.
+
+>>> mn=MultiNormal(par,varcov)
+
+Random points, generated in blocks from a seeded generator, one point 
+per row:
+
+>>> x=mn.sample(10**6, seed=42)
+
+Squared Mahalanobis distances (the chi-square with respect to the mean)
+and log-probabilities of the points:
+
+>>> chisq=mn.mahalanobis(x)
+>>> lnp=mn.logpdf(x)
+
+Density levels of the highest density regions containing 68% and 95% of 
+the probability, e.g. for drawing contours of the PDF (or of exp(-chisq/2)
+with norm=False):
+
+>>> levels=mn.hdr([0.68,0.95])
+
+:param mean: array with the mean (e.g. best-fit parameters), size d
+:param cov: d x d variance-covariance matrix
+	"""
+
+	def __init__(self, mean, cov):
+		self.mean=numpy.atleast_1d(numpy.asarray(mean,dtype=float))
+		self.cov=numpy.atleast_2d(numpy.asarray(cov,dtype=float))
+		self.d=self.mean.size
+
+		# cov = L L^T
+		try:
+			self.L=numpy.linalg.cholesky(self.cov)
+			self.logdet=2.*numpy.sum(numpy.log(numpy.diag(self.L)))
+			self.rank=self.d
+			self._w=None
+		except numpy.linalg.LinAlgError:
+			# singular covariance: cov = V diag(w) V^T with w>=0 (within roundoff)
+			w,V=numpy.linalg.eigh(self.cov)
+			tol=self.d*numpy.finfo(float).eps*numpy.abs(w).max()
+			if w.min()<-tol:
+				raise ValueError('the covariance matrix must be positive semi-definite')
+			self.L=V*numpy.sqrt(numpy.clip(w,0.,None))
+			# pseudo-determinant and whitening matrix of the non-null subspace
+			j=w>tol
+			self.logdet=numpy.sum(numpy.log(w[j]))
+			self.rank=numpy.count_nonzero(j)
+			self._w=V[:,j]/numpy.sqrt(w[j])
+
+
+
+	def sample(self, n, seed=None, blocksize=2**20, out=None):
+		"""
+	Generates n random points, one per row.
+
+	:param n: number of points
+	:param seed: seed or numpy.random.Generator
+	:param blocksize: number of points generated at once, which bounds the temporary memory used
+	:param out: optional (n, d) array (e.g. a memmap) which will hold the points
+	:returns: (n, d) array
+		"""
+		if out is None: out=numpy.empty((n,self.d))
+
+		for i,x in enumerate(self.blocks(n,seed,blocksize)):
+			out[i*blocksize:i*blocksize+x.shape[0]]=x
+
+		return out
+
+
+
+	def blocks(self, n, seed=None, blocksize=2**20):
+		"""
+	Generator of the n random points in blocks of at most blocksize points.
+	For the same seed, the concatenated blocks are the same as the output of
+	:meth:`sample` with the same blocksize.
+
+	>>> for x in mn.blocks(10**8, seed=42):
+	>>>     ...
+		"""
+		rng=numpy.random.default_rng(seed)
+
+		for i in range(0,n,blocksize):
+			z=rng.standard_normal((min(blocksize,n-i),self.d))
+			yield self.mean+z.dot(self.L.T)
+
+
+
+	def mahalanobis(self, x):
+		"""
+	Squared Mahalanobis distances of the points x (one per row, i.e. with 
+	shape (..., d)) from the mean, i.e. (x-mean)^T cov^-1 (x-mean), computed
+	with a triangular solve (with the pseudo-inverse of cov if it is 
+	singular).
+		"""
+		import scipy.linalg
+
+		x=numpy.asarray(x,dtype=float)
+		dx=(x-self.mean).reshape(-1,self.d).T
+		if self._w is None:
+			z=scipy.linalg.solve_triangular(self.L, dx, lower=True)
+		else:
+			z=self._w.T.dot(dx)
+
+		return numpy.sum(z**2,axis=0).reshape(x.shape[:-1])
+
+
+
+	def logpdf(self, x):
+		"""
+	Natural logarithm of the PDF at the points x (one per row).
+		"""
+		return -0.5*(self.mahalanobis(x)+self.rank*numpy.log(2.*numpy.pi)+self.logdet)
+
+
+
+	def pdf(self, x):
+		"""
+	PDF at the points x (one per row).
+		"""
+		return numpy.exp(self.logpdf(x))
+
+
+
+	def hdr(self, conf=[0.683,0.954,0.997], x=None, norm=True):
+		"""
+	Levels of the PDF corresponding to the highest density regions 
+	containing the fractions conf of the probability. For a normal 
+	distribution, these regions are the ellipsoids with Mahalanobis 
+	distance squared given by the chi-square distribution with d (or rank)
+	degrees of freedom. If random points x are given, the levels are instead the
+	ones enclosing the fractions conf of the points.
+
+	:param conf: fraction or list of fractions of the probability
+	:param x: optional array of points, one per row
+	:param norm: if True, gives levels of the PDF; otherwise, of exp(-chisq/2)
+	:returns: array of levels, in the same order as conf
+		"""
+		conf=numpy.asarray(conf)
+
+		if x is None:
+			chisq=scipy.stats.chi2.ppf(conf,self.rank)
+		else:
+			chisq=numpy.quantile(self.mahalanobis(x),conf)
+
+		lnp=-0.5*chisq
+		if norm: lnp=lnp-0.5*(self.rank*numpy.log(2.*numpy.pi)+self.logdet)
+
+		return numpy.exp(lnp)
+
+
+
+
+def gauss2d(par,varcov,n=10000,seed=None):
 	"""
 Calculates random numbers drawn from the multinormal distribution in
 two dimensions. Computes also the probability associated with each
@@ -704,6 +1224,7 @@ Arguments:
   parameters
 - varcov : variance-covariance matrix of the parameters
 - n : number of (a,b) points generated from the multivariate gaussian
+- seed : seed or numpy.random.Generator, for reproducible results
 
 Output:
 
@@ -713,29 +1234,25 @@ Output:
 Usage:
 >>> x,y,prob=gauss2d(par,varcov,100000)
 
+See :class:`MultiNormal` for any number of dimensions.
+
 v1 Apr. 2012
 	"""
+	mn=MultiNormal(par[:2],numpy.asarray(varcov)[:2,:2])
+
 	# Generates many realizations of a and b from the multinormal distribution
-	x,y = numpy.random.multivariate_normal(par,varcov,n).T
-	
-	# Best-fit values
-	x0,y0 = par[0], par[1]
+	x,y = mn.sample(n,seed).T
 	
-	dx,dy = x-x0,y-y0
-	sigx,sigy=numpy.sqrt(varcov[0,0]),numpy.sqrt(varcov[1,1])
-	cov=varcov[0,1]
-	rho=cov/sigx*sigy
-	
-	numchisq=(dx/sigx)**2+(dy/sigy)**2-2.*rho*(dx/sigx)*(dy/sigy)
-	chisq=numchisq/(1.-rho**2)
-	prob=numpy.exp(-chisq/2.)
+	# exp(-chi-square/2), with the chi-square given by the Mahalanobis 
+	# distance from the best-fit values
+	prob=numpy.exp(-mn.mahalanobis(numpy.column_stack((x,y)))/2.)
 	
 	return x,y,prob
 
 
 
 
-def bootcorr(x,y,nboot):
+def bootcorr(x,y,nboot,seed=None,processes=None,blocksize=None,verbose=False):
 	"""
 Given (X,Y) data points with intrinsic scatter, computes the 
 bootstrapped Pearson and Spearman correlation coefficients. This
@@ -747,40 +1264,120 @@ Usage:
 
 performs 100000 bootstrapping realizations on the arrays x and y.
 
+>>> r,rho=bootcorr(x,y,1000000,seed=42,processes=4,verbose=True)
+
+distributes the realizations over 4 processes and prints a summary of 
+the results (median and standard deviation of the statistics, and the 
+significance of the correlation).
+
+The realizations are computed in blocks, as (blocksize, x.size) arrays 
+of resampled data. Each block draws from its own random stream spawned
+from seed, hence the results do not depend on the number of processes.
+
+:param x,y: data arrays
+:param nboot: number of bootstrap realizations
+:param seed: integer seed, for reproducible results
+:param processes: if given, the blocks are distributed over a pool with this number of processes
+:param blocksize: number of realizations per block. By default, about 1e6 resampled points per block
+:param verbose: if True, prints a summary of the results
 :returns: *r* - array with bootstrapped Pearson statistics
 :returns: *rho* - bootstrapped array with Spearman statistics
 
 	"""
-	r,rho=[],[]
-	for i in range(nboot):
-		[xsim,ysim]=bootstrap([x,y])
-		
-		# Pearson r
-		rsim=scipy.stats.pearsonr(xsim,ysim)	
-		r.append(rsim[0])
-		
-		# Spearman rho
-		rhosim=scipy.stats.spearmanr(xsim,ysim)
-		rho.append(rhosim[0])
+	x,y=numpy.asarray(x,dtype=float),numpy.asarray(y,dtype=float)
+	if blocksize is None: blocksize=max(1, 2**20//x.size)
+
+	sizes=[min(blocksize,nboot-i) for i in range(0,nboot,blocksize)]
+	seeds=numpy.random.SeedSequence(seed).spawn(len(sizes))
+	jobs=[(x,y,k,ss) for k,ss in zip(sizes,seeds)]
+
+	if processes is None or len(jobs)<2:
+		results=[_bootcorr(job) for job in jobs]
+	else:
+		from concurrent.futures import ProcessPoolExecutor
 
-	r,rho=numpy.array(r),numpy.array(rho)
+		with ProcessPoolExecutor(processes) as pool:
+			results=list(pool.map(_bootcorr, jobs))
 
-	results=numpy.array([ numpy.median(r), r.std(), numpy.median(rho), rho.std() ])
-	print("<r>    err_r <rho> errrho")
-	print(numpy.round(results, 2))
+	r=numpy.concatenate([res[0] for res in results])
+	rho=numpy.concatenate([res[1] for res in results])
 
-	results=numpy.array([ r2p(numpy.median(r)-numpy.abs(r.std()),x.size), r2p(numpy.median(r),x.size), r2p(numpy.median(r)+numpy.abs(r.std()),x.size) ])
-	print("Prob. <- <r>-std,  <r>,    <r>+std")
-	print(results)
+	if verbose:
+		results=numpy.array([ numpy.median(r), r.std(), numpy.median(rho), rho.std() ])
+		print("<r>    err_r <rho> errrho")
+		print(numpy.round(results, 2))
 
-	print("Rejection of H0 respectively at")
-	for p in results:
-		print(round(p2sig(p),2)	)
+		results=numpy.array([ r2p(numpy.median(r)-numpy.abs(r.std()),x.size), r2p(numpy.median(r),x.size), r2p(numpy.median(r)+numpy.abs(r.std()),x.size) ])
+		print("Prob. <- <r>-std,  <r>,    <r>+std")
+		print(results)
+
+		print("Rejection of H0 respectively at")
+		for p in results:
+			print(round(p2sig(p),2)	)
 		
 	return r,rho
 
 
-def gen_ts(y,erry,n,zeropad=True):
+
+
+def _bootcorr(job):
+	"""
+Pearson and Spearman coefficients of a block of bootstrap realizations,
+see :func:`bootcorr`.
+	"""
+	x,y,nboot,seed=job
+	n=x.size
+
+	# Array of random indexes, one realization per row
+	rng=numpy.random.default_rng(seed)
+	iran=rng.integers(0,n,(nboot,n))
+
+	r=_pearson(x[iran],y[iran])
+	rho=_pearson(_bootrank(x,iran),_bootrank(y,iran))
+
+	return r,rho
+
+
+
+
+def _pearson(x,y):
+	"""
+Pearson coefficients between the rows of the 2D arrays x and y.
+	"""
+	x=x-x.mean(axis=1,keepdims=True)
+	y=y-y.mean(axis=1,keepdims=True)
+
+	with numpy.errstate(invalid='ignore', divide='ignore'):
+		return numpy.sum(x*y,axis=1)/numpy.sqrt(numpy.sum(x**2,axis=1)*numpy.sum(y**2,axis=1))
+
+
+
+
+def _bootrank(x,iran):
+	"""
+Ranks of the elements of each bootstrap realization x[iran] (one per 
+row), with ties getting the average rank as in scipy.stats.rankdata. 
+Instead of sorting every realization, counts how many times each 
+distinct value of x was drawn: the rank of a value is the number of 
+smaller values drawn plus the average position among the equal ones.
+	"""
+	values,group=numpy.unique(x,return_inverse=True)
+	m=values.size
+	nboot,n=iran.shape
+
+	# number of times each distinct value appears in each realization
+	g=group[iran]
+	counts=numpy.bincount((numpy.arange(nboot)[:,None]*m+g).ravel(), minlength=nboot*m).reshape(nboot,m)
+	below=numpy.cumsum(counts,axis=1)-counts
+
+	rank=below+(counts+1)/2.
+
+	return numpy.take_along_axis(rank,g,axis=1)
+
+
+
+
+def gen_ts(y,erry,n,zeropad=True,seed=None,dtype=float,out=None,blocksize=None):
     """
 Given a time series (TS) with uncertainties on the signal, this will generate 
 *n* new TS with y-values distributed according to the error bars. 
@@ -788,22 +1385,71 @@ Given a time series (TS) with uncertainties on the signal, this will generate
 Output will be a :math:`n \\times {\rm{size}(t)}` array. Each row of this
 array contains a simulated TS.
 
+>>> ysim=gen_ts(y,erry,10000,seed=42,dtype=numpy.float32)
+
+For millions of TS that do not fit in memory, the output can be written 
+directly to a memory-mapped array
+
+>>> out=numpy.lib.format.open_memmap('mock.npy',mode='w+',dtype=numpy.float32,shape=(10**7,y.size))
+>>> gen_ts(y,erry,10**7,out=out,blocksize=10**5)
+
+or the TS can be generated in blocks with :func:`gen_tsblocks`.
+
 :param y: array of y-values for time series (do not need to be in order)
 :param erry: array of 1-sigma errors on y-values
 :param n: number of Mock TS to generate
 :param zeropad: are y-values<0 not allowed? `True` will make any values<0 into 0
+:param seed: seed or numpy.random.Generator, for reproducible TS
+:param dtype: numpy.float64 or numpy.float32 (halves the memory)
+:param out: optional (n, size(y)) array (e.g. a memmap) which will hold the TS
+:param blocksize: if given, out is filled in blocks of this number of TS (useful for memmaps). The result does not depend on blocksize
 :returns: `n x size(t)` array. Each row of this array contains a simulated TS
     """
-    ysim=numpy.empty((n,y.size))
+    rng=numpy.random.default_rng(seed)
+    if out is None: out=numpy.empty((n,numpy.size(y)),dtype=dtype)
+    if blocksize is None: blocksize=max(n,1)
+
+    for i in range(0,n,blocksize):
+        _fill_ts(y,erry,out[i:i+blocksize],zeropad,rng)
     
-    for i in range(y.size):
-        # generate new points given normal distribution
-        ysim[:,i]=numpy.random.normal(y[i],erry[i],n)   
-        
+    return out
+
+
+def gen_tsblocks(y,erry,n,blocksize=10000,zeropad=True,seed=None,dtype=float):
+    """
+Generator version of :func:`gen_ts`, which yields the *n* simulated TS in 
+blocks of at most *blocksize* TS, so that they never need to be all in 
+memory at once.
+
+>>> for ysim in gen_tsblocks(y,erry,10**7,seed=42):
+>>>     ...
+
+For the same seed, the concatenated blocks are identical to the output of
+gen_ts.
+
+:param blocksize: number of TS in each block
+:returns: iterator over `blocksize x size(t)` arrays
+    """
+    rng=numpy.random.default_rng(seed)
+
+    for i in range(0,n,blocksize):
+        ysim=numpy.empty((min(blocksize,n-i),numpy.size(y)),dtype=dtype)
+        _fill_ts(y,erry,ysim,zeropad,rng)
+        yield ysim
+
+
+def _fill_ts(y,erry,out,zeropad,rng):
+    """
+Fills the 2D array out with simulated TS, drawn at once from the random
+generator rng, in place.
+    """
+    # generate new points given normal distribution
+    rng.standard_normal(out=out,dtype=out.dtype)
+    out*=numpy.asarray(erry,dtype=out.dtype)
+    out+=numpy.asarray(y,dtype=out.dtype)
+
     # makes sure no value is smaller than zero
-    ysim[ysim<0]=0.
-    
-    return ysim
+    if zeropad: numpy.maximum(out,0.,out=out)
 
 
 def random_normal(mean,std,n):
@@ -856,6 +1502,7 @@ in sigmas with which we can reject the null hypothesis. You can also
 give the :math:`\chi^2` values instead of RSS if you have y-errors.
 
 Note that p2>p1 must be obeyed, i.e. model 2 is "nested" within model 1.
+The arguments can be arrays, to compare many pairs of models at once.
 
 Usage:
 
@@ -878,8 +1525,9 @@ References:
 v1 Dec. 2011
 v2 Jan 16 2012: added comment regarding y-errors
 """
-	fstat=scipy.stats.f_value(rss1,rss2,n-p1,n-p2)
-	pvalue=1.-scipy.stats.f.cdf(fstat,p2-p1,n-p2)
+	rss1,rss2=numpy.asarray(rss1,dtype=float),numpy.asarray(rss2,dtype=float)
+	fstat=((rss1-rss2)/(p2-p1))/(rss2/(n-p2))
+	pvalue=scipy.stats.f.sf(fstat,p2-p1,n-p2)
 	conf=numpy.sqrt(2.)*scipy.special.erfinv(1.-pvalue)
 	
 	return fstat, pvalue, conf
@@ -905,6 +1553,8 @@ Usage:
 :param k: number of free parameters in the model
 :returns: AIC statistic
 
+rss and k can be arrays with the values for many models.
+
 References:
 
 1. Documentation for Origin software on fit comparison: http://www.originlab.com/index.aspx?go=Products/Origin/DataAnalysis/CurveFitting/NonlinearFitting&pid=1195 (first heard about this test there)
@@ -951,7 +1601,8 @@ Arguments:
 - n : sample size, i.e. number of data points
 - k : number of free parameters in the model
 
-Returns: BIC statistic
+Returns: BIC statistic (an array if rss and k are arrays with the values
+for many models)
 
 References:
 1. http://en.wikipedia.org/wiki/Bayesian_information_criterion
@@ -985,19 +1636,17 @@ See http://en.wikipedia.org/wiki/Goodness_of_fit for reference.
 If a linear model is not provided via A,B (y=ax+b) then the method computes
 the chi-square using the best-fit line.
 
-x,y,sd assumed to be Numpy arrays. a,b scalars. deg integer.
+x,y,sd assumed to be Numpy arrays. a,b scalars (or arrays with the 
+parameters of many models, giving an array).
 Returns the float chisq/nu with the reduced chi-square statistic.
 	"""
 
-	if a==None:	
+	if a is None:	
 		# Performs linear regression
 		a, b, r, p, err = scipy.stats.linregress(x,y)
 	
 	# Chi-square statistic
-	if sd==None:
-		chisq=numpy.sum((y-a*x-b)**2)
-	else:
-		chisq=numpy.sum( ((y-a*x-b)/sd)**2 )
+	chisq=chisqg(y,_linmodel(x,a,b),sd)
 		
 	# Number of degrees of freedom assuming 2 free parameters
 	nu=x.size-3
@@ -1023,10 +1672,10 @@ where
 
 - xdata,ydata : data
 - errx,erry : measurement uncertainties in the data
-- a,b : slope and intercept of the best-fit linear regression model
+- a,b : slope and intercept of the best-fit linear regression model,
+  or arrays with the parameters of many models (returns then an array)
 	"""
-	sdsq=erry**2+a**2*errx**2
-	chisq=numpy.sum( (y-a*x-b)**2/sdsq )
+	chisq=chisqxy(x,y,errx,erry,a,b)
 		
 	# Number of degrees of freedom assuming 2 free parameters
 	nu=x.size-3
@@ -1054,18 +1703,16 @@ Usage:
 where
 
 - ydata : data
-- ymod : model evaluated at the same x points as ydata
-- n : number of free parameters in the model
+- ymod : model evaluated at the same x points as ydata, or 2D array with 
+  one model per row (returns then an array)
+- n : number of free parameters in the model (an array for many models)
 - sd : uncertainties in ydata
   	"""
 	# Chi-square statistic
-	if sd==None:
-		chisq=numpy.sum((ydata-ymod)**2)
-	else:
-		chisq=numpy.sum( ((ydata-ymod)/sd)**2 )
+	chisq=chisqg(ydata,ymod,sd)
 		
 	# Number of degrees of freedom assuming 2 free parameters
-	nu=ydata.size-1-deg
+	nu=numpy.shape(ydata)[-1]-1-numpy.asarray(deg)
 	
 	return chisq/nu	
 
@@ -1083,10 +1730,12 @@ References:
 1. http://en.wikipedia.org/wiki/Coefficient_of_determination
 2. http://stackoverflow.com/questions/3460357/calculating-the-coefficient-of-determination-in-python
 
+ymod can be a 2D array with one model per row, giving an array of R^2.
+
 v1 Apr 18th 2012
 	"""
 	ss_tot = numpy.sum( (ydata-ydata.mean())**2 )
-	ss_err = numpy.sum( (ydata-ymod)**2 )
+	ss_err = numpy.sum( (ydata-ymod)**2, axis=-1 )
 	
 	return 1.-ss_err/ss_tot
 
@@ -1147,11 +1796,72 @@ Returns:
 
 
 
+def comparemodels(ydata,ymod,k,sd=None,names=None):
+	"""
+Compares the goodness-of-fit of many models to the same data set at once,
+building a table with the chi-square, reduced chi-square, AICc and BIC 
+of each model (see :func:`chisqg`, :func:`redchisqg`, :func:`aic` and 
+:func:`bic`), sorted from the best to the worst model according to AICc.
+If sd is not given, the information criteria are computed from the 
+residual sum of squares.
+
+Usage:
+
+>>> t=comparemodels(ydata,ymod,k,sd,names=['linear','broken','cubic'])
+>>> t['name'][0], t['daic'], t['weight']
+
+where
+
+- ydata : data
+- ymod : 2D array with the models evaluated at the same x points as ydata, one model per row
+- k : number of free parameters of each model (scalar or array)
+- sd : uncertainties in ydata
+- names : optional names of the models (by default, the indexes of the rows of ymod)
+
+:returns: numpy record array with the fields name, index (row in ymod), k, chisq, redchisq, aic, daic (difference to the best AICc), bic, dbic and weight (Akaike weight, i.e. relative likelihood of each model)
+	"""
+	ymod=numpy.atleast_2d(ymod)
+	nmod,n=ymod.shape
+	k=numpy.broadcast_to(k,(nmod,)).astype(float)
+	if names is None: names=numpy.arange(nmod).astype(str)
+
+	chisq=chisqg(ydata,ymod,sd)
+	errors=sd is not None
+	aicstat=aic(k,n,chisq,errors)
+	bicstat=bic(k,n,chisq,errors)
+
+	# Akaike weights
+	daic=aicstat-aicstat.min()
+	weight=numpy.exp(-daic/2.)
+	weight=weight/weight.sum()
+
+	i=numpy.argsort(aicstat, kind='stable')
+	cols=[numpy.asarray(names)[i], i, k[i], chisq[i], chisq[i]/(n-1.-k[i]), aicstat[i], daic[i], bicstat[i], bicstat[i]-bicstat.min(), weight[i]]
+
+	return numpy.rec.fromarrays(cols, names='name,index,k,chisq,redchisq,aic,daic,bic,dbic,weight')
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
 # Operations on statistical distributions
 # =======================================
 #
 
-def splitstd(x):
+def splitstd(x,chunksize=None,**kwargs):
 	"""
 Given the input distribution, this method computes two standard deviations:
 the left and right side spreads. This is especially useful if you are dealing
@@ -1167,38 +1877,128 @@ Algorithm:
 - create two new distributions, which are the symmetrical versions of the left and right side of the original one
 - compute the standard deviations for the new mirror distributions
 
+The mirror distributions are not actually created: their means are the 
+mode, hence their standard deviations are the root mean square 
+deviations from the mode of each side, which are accumulated over the 
+data (in chunks, if chunksize is given).
+
 :param x: array or list containing the distribution
+:param chunksize: if given, x (e.g. a memmap) is processed in chunks of this number of elements, see :func:`mode`
+:param kwargs: passed to :func:`mode`
 :returns: left.stddev, right.stddev
 
 .. note:: do not forget to inspect *x*.
 	"""
-	#med=median(x)
-	med=mode(x)
+	x=numpy.asarray(x)
+	med=mode(x,chunksize,**kwargs)
 
-	x1=x[ numpy.where(x<med) ] # left side
-	x1mirror=x1+2.*numpy.abs(x1-med) # mirror side
-	x1new=numpy.concatenate((x1,x1mirror))
+	# number of points and sums of the squared deviations from the mode, 
+	# for the left and right sides
+	n1,n2,s1,s2=0,0,0.,0.
+	for i in ([slice(None)] if chunksize is None else lsd.chunkslices(x,chunksize)):
+		d=numpy.ravel(x[i])-med
+		left=d<0
+		n1+=numpy.count_nonzero(left)
+		n2+=d.size-numpy.count_nonzero(left)
+		s1+=numpy.sum(d[left]**2)
+		s2+=numpy.sum(d[~left]**2)
 
-	x2=x[ numpy.where(x>=med) ] # right side
-	x2mirror=x2-2.*numpy.abs(x2-med) # mirror side
-	x2new=numpy.concatenate((x2,x2mirror))
+	return numpy.sqrt(s1/n1), numpy.sqrt(s2/n2)
 
-	return x1new.std(), x2new.std()
 
 
 
-
-def mode(x,**kwargs):
+def mode(x,chunksize=None,bins=2**14,maxbuffer=2**20):
 	"""
 Finds the mode of a distribution, i.e. the value where the PDF peaks.
 
+Uses the half-sample mode estimator of Bickel & Fruhwirth (2006): the 
+sorted sample is repeatedly replaced by its densest half, i.e. the 
+shortest interval containing half of the points, until only a few 
+points remain. This needs a single sort and no binning, and is robust 
+and precise for large samples such as MCMC chains.
+
+>>> m=mode(x)
+
+For arrays too large for memory (e.g. memmaps), the data can be 
+processed in chunks:
+
+>>> m=mode(x,chunksize=2**22)
+
+In this case, a histogram of the data with the given number of bins is 
+accumulated over the chunks and used as an approximation of the sorted 
+sample in order to find a densest interval with about 1/256 of the 
+data. This is repeated with the data within this interval (with a new
+pass over the chunks), until at most maxbuffer points are left, which are
+then gathered and processed exactly.
+
 :param x: input list/array with the distribution
+:param chunksize: if given, x is processed in chunks of this number of elements
+:param bins: number of bins of the histograms, for chunked input
+:param maxbuffer: maximum number of points gathered in memory, for chunked input
 	"""
-	yh,xh=numpy.histogram(x,50,normed=True,**kwargs)
-	dxh=(xh[1]-xh[0])/2.
-	xh=xh+dxh
+	if chunksize is None:
+		return _hsm(numpy.sort(numpy.ravel(x)))
 
-	return xh[ search(yh.max(),yh) ]
+	lo,hi=lsd.chunkmin(x,chunksize),lsd.chunkmax(x,chunksize)
+
+	while True:
+		# histogram of the data within [lo,hi]
+		edges=numpy.linspace(lo,hi,bins+1)
+		counts=numpy.zeros(bins,dtype=numpy.int64)
+		for i in lsd.chunkslices(x,chunksize):
+			counts+=numpy.histogram(x[i],edges)[0]
+		n=counts.sum()
+
+		if n<=maxbuffer or hi-lo<=4.*numpy.spacing(max(abs(lo),abs(hi))):
+			break
+
+		# approximation to the sorted sample, given by the quantiles of the 
+		# histogram, and its densest interval with ~1/256 of the points
+		m=min(n,2**16)
+		cdf=numpy.concatenate(([0],numpy.cumsum(counts)))
+		xs=numpy.interp((numpy.arange(m)+0.5)/m*n, cdf, edges)
+		lo1,hi1=_hsm(xs,stop=max(m//256,3))
+
+		# widened by one bin, to make sure the interval is not truncated 
+		# by the binning
+		h=edges[1]-edges[0]
+		lo,hi=max(lo1-h,lo),min(hi1+h,hi)
+
+	# gathers the remaining points
+	y=[]
+	for i in lsd.chunkslices(x,chunksize):
+		xi=numpy.ravel(x[i])
+		y.append(xi[(xi>=lo) & (xi<=hi)])
+
+	return _hsm(numpy.sort(numpy.concatenate(y)))
+
+
+
+
+def _hsm(x,stop=None):
+	"""
+Half-sample mode of the sorted array x. If stop is given, returns instead
+the interval (xmin,xmax) of the first densest subsample with at most stop
+points.
+	"""
+	while x.size>(3 if stop is None else stop):
+		# shortest interval containing half of the points
+		h=(x.size+1)//2
+		w=x[h-1:]-x[:x.size-h+1]
+		i=numpy.argmin(w)
+		x=x[i:i+h]
+
+	if stop is not None:
+		return x[0],x[-1]
+
+	if x.size==3:
+		d1,d2=x[1]-x[0],x[2]-x[1]
+		if d1<d2: return 0.5*(x[0]+x[1])
+		if d1>d2: return 0.5*(x[1]+x[2])
+		return x[1]
+
+	return x.mean()
 
 
 
@@ -1218,7 +2018,7 @@ Finds the mode of a distribution, i.e. the value where the PDF peaks.
 # ==================================
 #
 
-def randomvariate(pdf,n=1000,xmin=0,xmax=1):
+def randomvariate(pdf,n=1000,xmin=0,xmax=1,seed=None,method='rejection',points=10000,maxblock=2**22):
 	"""
 Rejection method for random number generation:
 Uses the rejection method for generating random numbers derived from an arbitrary 
@@ -1231,13 +2031,17 @@ Usage:
 
   where
 
-:param P: probability distribution function from which you want to generate random numbers
+:param P: probability distribution function from which you want to generate random numbers. Must accept arrays
 :param N: desired number of random values
 :param xmin,xmax: range of random numbers desired
+:param seed: seed or numpy.random.Generator, for reproducible results
+:param method: 'rejection' or 'invcdf'. The latter tabulates the CDF of P on a grid and draws the variates by inverting it (interpolating linearly), which needs no rejections but is approximate on the scale of the grid spacing
+:param points: number of points of the grid used by 'invcdf'
+:param maxblock: maximum number of candidates generated at once by 'rejection'
   
 :returns: the sequence (ran,ntrials) where
   	ran : array of shape N with the random variates that follow the input P
-  	ntrials : number of trials the code needed to achieve N
+  	ntrials : number of trials the code needed to achieve N (N for 'invcdf')
 
 Here is the algorithm:
 
@@ -1246,8 +2050,24 @@ Here is the algorithm:
 - if y'<P(x') accept x', otherwise reject
 - repeat until desired number is achieved
 
+The candidates are generated and tested in blocks, evaluating P once per
+block. The size of each block is set from the acceptance rate observed 
+so far (initially estimated from the area under P), so that typically 
+one or two blocks suffice.
+
 v1 Nov. 2011
 	"""
+	rng=numpy.random.default_rng(seed)
+
+	if method=='invcdf':
+		# Tabulated CDF (trapezoidal rule), normalized
+		x=numpy.linspace(xmin,xmax,points)
+		y=pdf(x)
+		cdf=numpy.concatenate(([0.],numpy.cumsum(0.5*(y[1:]+y[:-1])*numpy.diff(x))))
+		cdf=cdf/cdf[-1]
+
+		return numpy.interp(rng.random(n),cdf,x), n
+
 	# Calculates the minimal and maximum values of the PDF in the desired
 	# interval. The rejection method needs these values in order to work
 	# properly.
@@ -1259,19 +2079,30 @@ v1 Nov. 2011
 	# Counters
 	naccept=0
 	ntrial=0
+	rate=max(y.mean()/pmax, 1e-6)	# expected acceptance rate
 
 	# Keeps generating numbers until we achieve the desired n
-	ran=[]	# output list of random numbers
+	ran=[numpy.empty(0)]	# output list of arrays of random numbers
 	while naccept<n:
-		x=numpy.random.uniform(xmin,xmax)	# x'
-		y=numpy.random.uniform(pmin,pmax)	# y'
+		# enough candidates to (most likely) finish in this block
+		m=int(min(maxblock, 1.1*(n-naccept)/rate+100))
 
-		if y<pdf(x):
-			ran.append(x)
-			naccept=naccept+1
-		ntrial=ntrial+1
+		x=rng.uniform(xmin,xmax,m)	# x'
+		y=rng.uniform(pmin,pmax,m)	# y'
+		i=numpy.flatnonzero(y<pdf(x))
+
+		if naccept+i.size>=n:
+			# counts the trials only up to the n-th accepted number
+			i=i[:n-naccept]
+			ntrial=ntrial+i[-1]+1
+		else:
+			ntrial=ntrial+m
+
+		ran.append(x[i])
+		naccept=naccept+i.size
+		if naccept>0: rate=naccept/ntrial
 	
-	ran=numpy.asarray(ran)
+	ran=numpy.concatenate(ran)
 	
 	return ran,ntrial
 
@@ -1307,7 +2138,10 @@ class splitnorm_gen(scipy.stats.rv_continuous):
 Split normal distribution defined using scipy.stats. Can be called as 
 any scipy.stats distribution. I took the effort of defining the extra
 CDF and PPF methods below in order to speedup calls to this class 
-(I have particularly in mind the package *mcerp*).
+(I have particularly in mind the package *mcerp*). Random numbers are 
+drawn in closed form and the parameters are fitted by maximum 
+likelihood with :func:`splitnormfit`, instead of the generic (slow)
+methods of rv_continuous. The parameters can be arrays.
 
 :param x: input array where the PDF will be computed
 :param sig1: left standard deviation
@@ -1319,7 +2153,7 @@ Examples:
 Defines distribution with sig1=1, sig2=3, mu=0:
 
 >>> split = splitnorm_gen(name='splitnorm', shapes='sig1, sig2, mu')
->>> s=split(1,3,0.0001)
+>>> s=split(1,3,0)
 >>> x=numpy.linspace(-10,10,100)
 
 Computes PDF:
@@ -1334,8 +2168,14 @@ Generates 100 random numbers:
 
 >>> s.rvs(100)
 
-.. warning:: for some reason, this fails if mu=0.
+Fits the distribution to a sample, giving (sig1, sig2, mu, loc, scale):
+
+>>> split.fit(x)
     """
+    def _argcheck(self, sig1, sig2, mu):
+        # the mode can be any real number
+        return (sig1>0) & (sig2>0) & numpy.isfinite(mu)
+
     def _pdf(self, x, sig1, sig2, mu):
         const=numpy.sqrt(2./numpy.pi)/(sig1 + sig2)
             
@@ -1365,6 +2205,25 @@ Generates 100 random numbers:
         
         return pf     
     
+    def _rvs(self, sig1, sig2, mu, size=None, random_state=None):
+        # Half-normal deviates, on the left of the mode with probability 
+        # sig1/(sig1+sig2) (scaled by sig1) and on the right otherwise 
+        # (scaled by sig2)
+        z=numpy.abs(random_state.standard_normal(size))
+        left=random_state.random(size)*(sig1+sig2)<sig1
+        
+        return mu+numpy.where(left,-sig1,sig2)*z
+
+    def fit(self, data, *args, **kwds):
+        # maximum likelihood estimates in closed form, unless the user 
+        # fixes some of the parameters or gives starting values
+        if args or kwds:
+            return super().fit(data, *args, **kwds)
+
+        sig1,sig2,mu=splitnormfit(data)
+        
+        return sig1, sig2, mu, 0., 1.
+    
     def _stats(self, sig1, sig2, mu):
         mean=mu+numpy.sqrt(2./numpy.pi)*(sig2 - sig1)
         var=(1.-2./numpy.pi)*(sig2-sig1)**2 + sig1*sig2
@@ -1392,6 +2251,63 @@ Generates 100 random numbers:
 
 
 
+
+
+def splitnormfit(x):
+	"""
+Maximum likelihood estimates of the parameters of the split normal 
+distribution (see :func:`splitnorm`) for the sample x.
+
+For a given mode mu, the likelihood is maximized by 
+sig1=S1^(1/3) sqrt(A/n) and sig2=S2^(1/3) sqrt(A/n), where S1 and S2 are the
+sums of (x-mu)^2 for the points below and above mu, and A=S1^(1/3)+S2^(1/3).
+The maximum likelihood mode is the one which minimizes A. A is computed 
+for all the points in the sample as trial modes at once with cumulative
+sums over the sorted sample, and the minimum is then refined between 
+the neighbouring points.
+
+>>> sig1,sig2,mu=splitnormfit(x)
+
+:param x: array with the sample
+:returns: sig1, sig2, mu
+	"""
+	import scipy.optimize
+
+	x=numpy.sort(numpy.ravel(x))
+	n=x.size
+	x0=x.mean()
+	y=x-x0	# centered, to reduce roundoff errors in the sums below
+
+	c1=numpy.concatenate(([0.],numpy.cumsum(y)))
+	c2=numpy.concatenate(([0.],numpy.cumsum(y**2)))
+
+	def a(mu,k):
+		# A(mu) with k points below mu
+		s1=c2[k]-2.*mu*c1[k]+k*mu**2
+		s2=(c2[n]-c2[k])-2.*mu*(c1[n]-c1[k])+(n-k)*mu**2
+		return numpy.cbrt(numpy.maximum(s1,0.))+numpy.cbrt(numpy.maximum(s2,0.))
+
+	# best data point as trial mode
+	k=numpy.arange(n)
+	j=numpy.argmin(a(y,k))
+
+	# refines it in the intervals next to that point
+	mu,amin=y[j],a(y[j],j)
+	for lo,hi,kk in ((max(j-1,0),j,j),(j,min(j+1,n-1),j+1)):
+		if hi>lo:
+			res=scipy.optimize.minimize_scalar(a,bounds=(y[lo],y[hi]),args=(kk,),method='bounded')
+			if res.fun<amin: mu,amin=res.x,res.fun
+
+	# standard deviations, from sums over the sample
+	s1=numpy.sum((y[y<mu]-mu)**2)
+	s2=numpy.sum((y[y>=mu]-mu)**2)
+	amin=numpy.cbrt(s1)+numpy.cbrt(s2)
+
+	return numpy.cbrt(s1)*numpy.sqrt(amin/n), numpy.cbrt(s2)*numpy.sqrt(amin/n), mu+x0
+
+
+
+
 
 
 # p-values and significance
@@ -1420,7 +2336,7 @@ points.
 		prob = 0.0
 	else:
 		t_squared = r*r * (df / ((1.0 - r) * (1.0 + r)))
-		prob = scipy.stats.betai(0.5*df, 0.5, df / (df + t_squared))
+		prob = scipy.special.betainc(0.5*df, 0.5, df / (df + t_squared))
         
 	return prob
 